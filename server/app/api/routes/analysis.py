@@ -1,15 +1,19 @@
 import asyncio
 import base64
+import contextvars
+import json
 import logging
+import random
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 
 import aiofiles
 from bson import ObjectId
-from fastapi import APIRouter, File, HTTPException, Request, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +28,49 @@ from app.models.analysis import (
     PlantCareLLMResponse,
 )
 from app.core.config import settings
-from app.llm_core import get_leaf_analysis
-from app.utils.image_hashing import compute_phash_hex, phash_hamming_distance
-from app.utils.image_preprocessing import preprocess_leaf_image_bytes
-from app.utils.weather import build_location_weather_context_for_coordinates
+from app.core.deadline import DeadlineExceeded, deadline_scope, stage_timeout, start_deadline
+from app.core.tracing import PipelineTrace, clear_trace, start_trace
+from app.db import analysis_cache
+from app.llm_core import (
+    degradation_stats,
+    get_leaf_analysis,
+    model_pool_health,
+    scheduler_stats,
+    text_path_stats,
+    vision_merge_stats,
+)
+from app.llm_core.degradation import lite_mode_active, reset_lite_mode
+from app.llm_core.ensemble import VISION_ENSEMBLE_MODEL_IDS
+from app.llm_core.vision_payload import VisionPayload, vision_image_targets, vision_payload_stats
+from app.llm_core.scheduler import set_request_identity, use_lane
+from app.rag_core.embeddings import get_embedding_generator
+from app.utils.admission import (
+    AdmissionSlot,
+    AdmittedStreamingResponse,
+    admission_stats,
+    analysis_admission,
+)
+from app.utils.auth import superuser_required
+from app.utils.image_hashing import compute_phash_hex, phash_storage_fields
+from app.utils.image_preprocessing import encode_vision_image_bytes, preprocess_leaf_image_bytes
+from app.utils.image_workers import ImageWorkersUnavailable, run_image_task
+from app.utils.response_cache import (
+    care_cache_key,
+    get_care_cache,
+    get_symptoms_cache,
+    symptoms_cache_key,
+)
+from app.utils.semantic_cache import (
+    build_semantic_text,
+    get_semantic_symptoms_cache,
+    same_diagnosis,
+)
+from app.utils.singleflight import get_singleflight, singleflight_stats
+from app.utils.weather import (
+    LocationClimateContext,
+    build_location_weather_context_for_coordinates,
+    climate_risk_bucket,
+)
 
 
 def _get_leaf_analysis():
@@ -110,6 +153,12 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 PREPROCESSED_DIR = Path("uploads/preprocessed")
 PREPROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
+# Idle interval after which streaming responses send a keep-alive comment.
+SSE_KEEPALIVE_SECONDS = 10
+
+# Translation sources for cross-language cache reuse, most reliable first.
+CROSS_LANGUAGE_SOURCE_ORDER = ("en", "hi", "as", "brx")
+
 
 def _extract_coordinates(request_with_location) -> tuple[Optional[float], Optional[float]]:
     location = getattr(request_with_location, "location", None)
@@ -132,43 +181,103 @@ async def _find_cached_image_analysis(
     language: str,
     location_scope: str,
 ) -> tuple[Optional[dict[str, Any]], Optional[int]]:
-    """Find nearest cached image analysis using pHash Hamming distance."""
-    cache_query = {
-        "analysis_type": "image",
-        "request_data.language": language,
-        "request_data.location_scope": location_scope,
-        "request_data.image_phash": {"$exists": True},
-        "response_data": {"$exists": True},
+    """Find nearest cached image analysis via the resident pHash index or Mongo band indexes."""
+    index = req.app.phash_index
+    if settings.PHASH_CACHE_LOOKUP == "mongo":
+        match = await analysis_cache.find_nearest(
+            req.app.mongodb,
+            phash=image_phash,
+            language=language,
+            location_scope=location_scope,
+            max_distance=settings.PHASH_HAMMING_DISTANCE_THRESHOLD,
+        )
+    else:
+        match = index.query(
+            language=language,
+            location_scope=location_scope,
+            phash_hex=image_phash,
+            max_distance=settings.PHASH_HAMMING_DISTANCE_THRESHOLD,
+        )
+        if match is None and (index.evicted or not index.complete):
+            # The index only holds the most recent entries, or the backfill has not
+            # reached it yet; the rest are in Mongo.
+            match = await analysis_cache.find_nearest(
+                req.app.mongodb,
+                phash=image_phash,
+                language=language,
+                location_scope=location_scope,
+                max_distance=settings.PHASH_HAMMING_DISTANCE_THRESHOLD,
+            )
+    if match is None:
+        return None, None
+
+    cache_key = {
+        "phash": f"{match.phash:016x}",
+        "language": language,
+        "location_scope": location_scope,
     }
     projection = {
         "request_data.image_phash": 1,
         "response_data": 1,
     }
-    cursor = (
-        req.app.mongodb["analysis_history"]
-        .find(cache_query, projection)
-        .sort("timestamp", -1)
-        .limit(settings.PHASH_CACHE_MAX_CANDIDATES)
+    cache_entry, doc = await asyncio.gather(
+        analysis_cache.record_hit(req.app.mongodb, **cache_key),
+        req.app.mongodb["analysis_history"].find_one({"_id": match.entry_id}, projection),
     )
-    docs = await cursor.to_list(length=settings.PHASH_CACHE_MAX_CANDIDATES)
-
-    best_doc: Optional[dict[str, Any]] = None
-    best_distance: Optional[int] = None
-    for doc in docs:
-        candidate_hash = doc.get("request_data", {}).get("image_phash")
-        distance = phash_hamming_distance(image_phash, candidate_hash)
-        if distance is None:
+    if not cache_entry or not doc or not doc.get("response_data"):
+        # Evicted by TTL or the canonical analysis was deleted; forget it.
+        index.remove(language, location_scope, match.phash)
+        if cache_entry:
+            await analysis_cache.delete_entry(req.app.mongodb, **cache_key)
+        return None, None
+
+    return doc, match.distance
+
+
+async def _find_cached_image_analysis_other_language(
+    req: Request,
+    image_phash: str,
+    language: str,
+    location_scope: str,
+) -> tuple[Optional[dict[str, Any]], Optional[int], Optional[str]]:
+    """Find a same-scope cached analysis in another language that can be translated."""
+    for source_language in CROSS_LANGUAGE_SOURCE_ORDER:
+        if source_language == language:
             continue
-        if best_distance is None or distance < best_distance:
-            best_doc = doc
-            best_distance = distance
+        doc, distance = await _find_cached_image_analysis(
+            req=req,
+            image_phash=image_phash,
+            language=source_language,
+            location_scope=location_scope,
+        )
+        if doc:
+            return doc, distance, source_language
+    return None, None, None
 
-    if best_doc is None or best_distance is None:
-        return None, None
-    if best_distance > settings.PHASH_HAMMING_DISTANCE_THRESHOLD:
-        return None, None
 
-    return best_doc, best_distance
+async def _store_cached_image_analysis(
+    req: Request,
+    image_phash: str,
+    language: str,
+    location_scope: str,
+    history_id: str,
+) -> None:
+    """Make a fresh image analysis the canonical cache entry for its pHash and scope."""
+    await analysis_cache.upsert_entry(
+        req.app.mongodb,
+        phash=image_phash,
+        language=language,
+        location_scope=location_scope,
+        history_id=history_id,
+    )
+    if settings.PHASH_CACHE_LOOKUP == "memory":
+        req.app.phash_index.add(
+            language=language,
+            location_scope=location_scope,
+            phash_hex=image_phash,
+            entry_id=history_id,
+        )
+
 
 @router.post("/upload", response_model=ImageUploadResponse, status_code=201)
 async def upload_image(
@@ -187,9 +296,11 @@ async def upload_image(
         raise HTTPException(status_code=400, detail="File size too large (max 10MB)")
 
     try:
-        image_phash = compute_phash_hex(file_content)
-    except Exception as e:
+        image_phash = await run_image_task(req.app, compute_phash_hex, file_content)
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Unsupported image payload: {str(e)}")
+    except ImageWorkersUnavailable:
+        raise HTTPException(status_code=503, detail="Image processing is temporarily unavailable, retry shortly")
     
     # Generate unique image ID and file path
     image_id = str(ObjectId())
@@ -214,6 +325,7 @@ async def upload_image(
             "content_type": file.content_type,
             "file_path": str(file_path),
             "phash": image_phash,
+            **phash_storage_fields(image_phash),
             "user_id": user_id,
             "uploaded_at": datetime.now()
         }
@@ -234,49 +346,151 @@ async def upload_image(
     )
 
 
-@router.post("/analyze", response_model=ImageAnalysisLLMResponse)
-async def analyze_uploaded_image(
-    req: Request,
-    request: ImageAnalysisRequest,
-):
-    """Analyze a previously uploaded image using its ID"""
-    # Get uploaded image metadata from database
-    try:
-        image_doc = await req.app.mongodb["uploaded_images"].find_one({
-            "_id": request.image_id
-        })
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+def _apply_trace_headers(response: Response, trace: PipelineTrace, cache_status: str) -> None:
+    """Expose which pipeline stages ran so hit and miss latency can be compared."""
+    response.headers["Server-Timing"] = trace.server_timing_header()
+    response.headers["X-Analysis-Cache"] = cache_status
+    response.headers["X-Analysis-Mode"] = "lite" if trace.details.get("lite_mode") else "full"
+    vision_experts = trace.details.get("vision_experts")
+    if vision_experts:
+        response.headers["X-Analysis-Experts"] = ",".join(vision_experts["contributed"])
 
-    if not image_doc:
-        raise HTTPException(status_code=404, detail="Image not found")
 
-    latitude, longitude = _extract_coordinates(request)
-    location_scope = _location_scope_from_coordinates(latitude, longitude)
-    weather_context = await asyncio.to_thread(
-        build_location_weather_context_for_coordinates,
-        latitude,
-        longitude,
+def _sse_message(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _event_stream_response(
+    run: Callable[[PipelineTrace], Awaitable[tuple[BaseModel, str]]],
+    slot: AdmissionSlot,
+) -> StreamingResponse:
+    """Run an analysis and stream its progress, then the final model, as Server-Sent Events.
+
+    Pipeline stages, expert answers and verifier fields are sent as they happen;
+    the last event is ``result`` (the validated model) or ``error``. Comment lines
+    are sent while idle so proxies keep the connection open. The admission
+    ``slot`` is held until the stream ends.
+    """
+
+    async def event_stream() -> AsyncIterator[str]:
+        events: asyncio.Queue = asyncio.Queue()
+        trace = start_trace(events=events)
+        task = asyncio.create_task(run(trace))
+        try:
+            while True:
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait(
+                    {next_event, task},
+                    timeout=SSE_KEEPALIVE_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if next_event in done:
+                    event = next_event.result()
+                    yield _sse_message(event.pop("event"), event)
+                    continue
+                next_event.cancel()
+                if task in done:
+                    break
+                yield ": keep-alive\n\n"
+
+            while not events.empty():
+                event = events.get_nowait()
+                yield _sse_message(event.pop("event"), event)
+
+            try:
+                result, cache_status = task.result()
+            except HTTPException as e:
+                yield _sse_message("error", {"status_code": e.status_code, "detail": e.detail})
+                return
+            except Exception as e:
+                logger.warning(f"Streaming analysis failed: {str(e)}")
+                yield _sse_message("error", {"status_code": 500, "detail": str(e)})
+                return
+
+            yield _sse_message(
+                "result",
+                {
+                    "cache": cache_status,
+                    "mode": "lite" if trace.details.get("lite_mode") else "full",
+                    "stage_timings_ms": dict(trace.stages),
+                    "total_ms": trace.elapsed_ms(),
+                    "data": result.model_dump(),
+                },
+            )
+        finally:
+            # Client went away: stop the analysis (shared image runs are shielded).
+            if not task.done():
+                task.cancel()
+
+    return AdmittedStreamingResponse(
+        event_stream(),
+        slot=slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    # Read image file from disk
-    file_path = Path(image_doc["file_path"])
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Image file not found on disk")
 
-    image_phash = image_doc.get("phash")
+def _identify_caller(req: Request) -> None:
+    """Tag this request's LLM calls with its user (or client IP) for fair queuing."""
+    user = getattr(req.state, "user", None)
+    set_request_identity(
+        user_id=user.email if user else None,
+        client_ip=req.client.host if req.client else None,
+    )
+
+
+def _deadline_exceeded_error(exc: DeadlineExceeded) -> HTTPException:
+    return HTTPException(status_code=504, detail=f"Analysis timed out during {exc.stage}")
+
+
+async def _load_weather_context(
+    trace: PipelineTrace,
+    latitude: Optional[float],
+    longitude: Optional[float],
+) -> Optional[LocationClimateContext]:
+    """Weather for the request, or None when it does not arrive within its share of the budget."""
+    with trace.stage("weather"):
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(
+                    build_location_weather_context_for_coordinates,
+                    latitude,
+                    longitude,
+                ),
+                timeout=stage_timeout(settings.WEATHER_TIMEOUT_SECONDS),
+            )
+        except TimeoutError:
+            # The lookup thread finishes in the background; the analysis goes on without weather.
+            logger.warning("Weather lookup timed out, continuing without weather context")
+            trace.details["weather_dropped"] = True
+            return None
 
-    try:
-        # Read and encode image to base64
-        async with aiofiles.open(file_path, "rb") as f:
-            file_content = await f.read()
 
-        processed_file_content = file_content
+async def _preprocess_uploaded_image(
+    req: Request,
+    trace: PipelineTrace,
+    image_id: str,
+    file_content: bytes,
+) -> tuple[VisionPayload, bool]:
+    """Run OpenCV preprocessing and persist its artifacts, falling back to the raw image.
+
+    Returns the vision experts' input: the leaf crop encoded at each model's
+    target resolution and quality.
+    """
+    vision_targets = vision_image_targets(VISION_ENSEMBLE_MODEL_IDS)
+    with trace.stage("preprocess"):
         try:
-            processed_file_content, compare_bytes, preprocess_meta = preprocess_leaf_image_bytes(file_content)
+            async with deadline_scope("preprocess"):
+                processed_file_content, compare_bytes, preprocess_meta, vision_images = await run_image_task(
+                    req.app,
+                    preprocess_leaf_image_bytes,
+                    file_content,
+                    vision_targets,
+                    settings.VISION_ROI_PADDING if settings.VISION_ROI_CROP else None,
+                )
 
-            preprocessed_path = PREPROCESSED_DIR / f"{request.image_id}_preprocessed.jpg"
-            compare_path = PREPROCESSED_DIR / f"{request.image_id}_compare.jpg"
+            preprocessed_path = PREPROCESSED_DIR / f"{image_id}_preprocessed.jpg"
+            compare_path = PREPROCESSED_DIR / f"{image_id}_compare.jpg"
 
             async with aiofiles.open(preprocessed_path, "wb") as processed_out:
                 await processed_out.write(processed_file_content)
@@ -284,7 +498,7 @@ async def analyze_uploaded_image(
                 await compare_out.write(compare_bytes)
 
             await req.app.mongodb["uploaded_images"].update_one(
-                {"_id": request.image_id},
+                {"_id": image_id},
                 {
                     "$set": {
                         "preprocessed_file_path": str(preprocessed_path),
@@ -293,122 +507,363 @@ async def analyze_uploaded_image(
                     }
                 },
             )
+            trace.details["vision_roi"] = {
+                "roi_area_ratio": preprocess_meta["roi_area_ratio"],
+                "full_frame_bytes": preprocess_meta["full_frame_bytes"],
+            }
+            return VisionPayload.from_encoded(vision_images), True
         except Exception as preprocess_error:
             logger.warning(
                 "OpenCV preprocessing failed for image_id=%s, using raw image: %s",
-                request.image_id,
+                image_id,
                 preprocess_error,
             )
 
-        if not image_phash:
-            image_phash = compute_phash_hex(file_content)
-            await req.app.mongodb["uploaded_images"].update_one(
-                {"_id": request.image_id},
-                {"$set": {"phash": image_phash}},
+        try:
+            vision_images = await run_image_task(
+                req.app,
+                encode_vision_image_bytes,
+                file_content,
+                vision_targets,
             )
+            return VisionPayload.from_encoded(vision_images), False
+        except Exception as encode_error:
+            logger.warning("Could not re-encode raw image_id=%s, sending it as uploaded: %s", image_id, encode_error)
+            return VisionPayload.from_base64(base64.b64encode(file_content).decode("utf-8")), False
+
+
+@router.post(
+    "/analyze",
+    response_model=ImageAnalysisLLMResponse,
+    dependencies=[Depends(analysis_admission("vision"))],
+)
+async def analyze_uploaded_image(
+    req: Request,
+    request: ImageAnalysisRequest,
+    response: Response,
+):
+    """Analyze a previously uploaded image using its ID"""
+    trace = start_trace()
+    result, cache_status = await _run_image_analysis(req, request, trace)
+    _apply_trace_headers(response, trace, cache_status=cache_status)
+    return result
+
+
+@router.post("/analyze/stream")
+async def analyze_uploaded_image_stream(
+    req: Request,
+    request: ImageAnalysisRequest,
+    slot: AdmissionSlot = Depends(analysis_admission("vision")),
+):
+    """Analyze a previously uploaded image, streaming progress as Server-Sent Events"""
+    return _event_stream_response(lambda trace: _run_image_analysis(req, request, trace), slot)
+
+
+async def _run_image_analysis(
+    req: Request,
+    request: ImageAnalysisRequest,
+    trace: PipelineTrace,
+) -> tuple[ImageAnalysisLLMResponse, str]:
+    """Image analysis shared by the JSON and streaming routes; returns the cache status too."""
+    start_deadline(settings.ANALYZE_DEADLINE_SECONDS)
+    _identify_caller(req)
+    reset_lite_mode()
+    # Get uploaded image metadata from database
+    try:
+        with trace.stage("image_lookup"):
+            image_doc = await req.app.mongodb["uploaded_images"].find_one({
+                "_id": request.image_id
+            })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    if not image_doc:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    latitude, longitude = _extract_coordinates(request)
+    location_scope = _location_scope_from_coordinates(latitude, longitude)
+
+    file_path = Path(image_doc["file_path"])
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Image file not found on disk")
+
+    # Get user_id if logged in
+    user_id = None
+    if hasattr(req.state, "user") and req.state.user:
+        user_id = req.state.user.email
+
+    image_phash = image_doc.get("phash")
+    file_content: Optional[bytes] = None
+
+    try:
+        if not image_phash:
+            # Older uploads were stored without a hash; compute it once and keep it.
+            with trace.stage("phash"):
+                async with aiofiles.open(file_path, "rb") as f:
+                    file_content = await f.read()
+                image_phash = await run_image_task(req.app, compute_phash_hex, file_content)
+                await req.app.mongodb["uploaded_images"].update_one(
+                    {"_id": request.image_id},
+                    {"$set": {"phash": image_phash, **phash_storage_fields(image_phash)}},
+                )
 
+        # Cache first: a hit skips weather, preprocessing, disk writes and the LLM.
         if image_phash:
-            cached_doc, cache_distance = await _find_cached_image_analysis(
-                req=req,
-                image_phash=image_phash,
-                language=request.language,
-                location_scope=location_scope,
-            )
+            with trace.stage("cache_lookup"):
+                cached_doc, cache_distance = await _find_cached_image_analysis(
+                    req=req,
+                    image_phash=image_phash,
+                    language=request.language,
+                    location_scope=location_scope,
+                )
+            translated_from: Optional[str] = None
+            if not cached_doc and settings.PHASH_CACHE_CROSS_LANGUAGE:
+                with trace.stage("cache_lookup_cross_language"):
+                    cached_doc, cache_distance, translated_from = await _find_cached_image_analysis_other_language(
+                        req=req,
+                        image_phash=image_phash,
+                        language=request.language,
+                        location_scope=location_scope,
+                    )
+
+            result: Optional[ImageAnalysisLLMResponse] = None
             if cached_doc:
                 cached_response = cached_doc.get("response_data") or {}
                 result = ImageAnalysisLLMResponse.model_validate(cached_response)
+                if translated_from:
+                    try:
+                        with trace.stage("translate"):
+                            async with deadline_scope("translate"):
+                                result = await _get_leaf_analysis().translate_image_analysis(
+                                    response=result,
+                                    source_language=translated_from,
+                                    target_language=request.language,
+                                )
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as translate_error:
+                        # A failed translation is just a miss; run the full analysis instead.
+                        logger.warning(
+                            "Cross-language cache translation %s->%s failed: %s",
+                            translated_from,
+                            request.language,
+                            translate_error,
+                        )
+                        result = None
+
+            if result is not None:
                 result = _sanitize_image_result(result)
 
-                user_id = None
-                if hasattr(req.state, "user") and req.state.user:
-                    user_id = req.state.user.email
-
+                history_id = str(ObjectId())
                 try:
-                    await req.app.mongodb["analysis_history"].insert_one(
-                        {
-                            "_id": str(ObjectId()),
-                            "analysis_type": "image",
-                            "image_id": request.image_id,
-                            "user_id": user_id,
-                            "request_data": {
+                    with trace.stage("history_write"):
+                        await req.app.mongodb["analysis_history"].insert_one(
+                            {
+                                "_id": history_id,
+                                "analysis_type": "image",
                                 "image_id": request.image_id,
-                                "filename": image_doc["filename"],
-                                "language": request.language,
-                                "location": request.location.model_dump() if request.location else None,
-                                "location_scope": location_scope,
-                                "image_phash": image_phash,
-                                "cache_hit": True,
-                                "cache_distance": int(cache_distance) if cache_distance is not None else None,
-                            },
-                            "response_data": result.model_dump(),
-                            "cache_source_history_id": str(cached_doc.get("_id")),
-                            "timestamp": datetime.now(),
-                        }
-                    )
+                                "user_id": user_id,
+                                "request_data": {
+                                    "image_id": request.image_id,
+                                    "filename": image_doc["filename"],
+                                    "language": request.language,
+                                    "location": request.location.model_dump() if request.location else None,
+                                    "location_scope": location_scope,
+                                    "image_phash": image_phash,
+                                    **phash_storage_fields(image_phash, prefix="image_phash"),
+                                    "cache_hit": True,
+                                    "cache_distance": int(cache_distance) if cache_distance is not None else None,
+                                    "cache_translated_from": translated_from,
+                                },
+                                "response_data": result.model_dump(),
+                                "cache_source_history_id": str(cached_doc.get("_id")),
+                                "stage_timings_ms": dict(trace.stages),
+                                "timestamp": datetime.now(),
+                            }
+                        )
+                        if translated_from:
+                            # The translation becomes the canonical entry for this language.
+                            await _store_cached_image_analysis(
+                                req,
+                                image_phash=image_phash,
+                                language=request.language,
+                                location_scope=location_scope,
+                                history_id=history_id,
+                            )
                 except Exception as history_error:
                     logger.warning("Failed to save cache-hit history: %s", history_error)
 
                 logger.info(
-                    "pHash cache hit for image_id=%s distance=%s language=%s scope=%s",
+                    "pHash cache hit for image_id=%s distance=%s language=%s (from %s) scope=%s in %sms",
                     request.image_id,
                     cache_distance,
                     request.language,
+                    translated_from or request.language,
                     location_scope,
+                    trace.elapsed_ms(),
                 )
-                return result
+                return result, "translated" if translated_from else "hit"
 
-        image_base64 = base64.b64encode(processed_file_content).decode("utf-8")
+        # Cache miss: identical requests already in flight share one pipeline run.
+        flight_key = (image_phash or request.image_id, request.language, location_scope)
 
-        # Perform analysis
-        result = _get_leaf_analysis().analyze_leaf_image(
-            image_base64=image_base64,
+        async def run_analysis() -> dict[str, Any]:
+            return await _run_image_analysis_pipeline(
+                req=req,
+                trace=trace,
+                request=request,
+                image_doc=image_doc,
+                file_path=file_path,
+                file_content=file_content,
+                image_phash=image_phash,
+                location_scope=location_scope,
+                latitude=latitude,
+                longitude=longitude,
+                user_id=user_id,
+            )
+
+        async with deadline_scope("analysis"):
+            outcome, coalesced = await get_singleflight("image").do(flight_key, run_analysis)
+        result = ImageAnalysisLLMResponse.model_validate(outcome["response_data"])
+        if outcome["lite_mode"]:
+            trace.details["lite_mode"] = True
+    except DeadlineExceeded as e:
+        raise _deadline_exceeded_error(e)
+    except ImageWorkersUnavailable:
+        # Only the pHash of older uploads needs the workers; preprocessing falls back to the raw image.
+        raise HTTPException(status_code=503, detail="Image processing is temporarily unavailable, retry shortly")
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Analysis failed: {str(e)}")
+
+    if coalesced:
+        # The leader already stored the canonical history row and cache entry.
+        try:
+            with trace.stage("history_write"):
+                await req.app.mongodb["analysis_history"].insert_one(
+                    {
+                        "_id": str(ObjectId()),
+                        "analysis_type": "image",
+                        "image_id": request.image_id,
+                        "user_id": user_id,
+                        "request_data": {
+                            "image_id": request.image_id,
+                            "filename": image_doc["filename"],
+                            "language": request.language,
+                            "location": request.location.model_dump() if request.location else None,
+                            "location_scope": location_scope,
+                            "image_phash": image_phash,
+                            **phash_storage_fields(image_phash, prefix="image_phash"),
+                            "cache_hit": True,
+                            "coalesced": True,
+                            "weather_context": outcome["weather_context"],
+                        },
+                        "response_data": outcome["response_data"],
+                        "cache_source_history_id": outcome["history_id"],
+                        "lite_mode": outcome["lite_mode"],
+                        "stage_timings_ms": dict(trace.stages),
+                        "timestamp": datetime.now(),
+                    }
+                )
+        except Exception as e:
+            logger.warning(f"Failed to save coalesced analysis history: {str(e)}")
+
+    return result, "coalesced" if coalesced else "miss"
+
+
+async def _run_image_analysis_pipeline(
+    *,
+    req: Request,
+    trace: PipelineTrace,
+    request: ImageAnalysisRequest,
+    image_doc: dict[str, Any],
+    file_path: Path,
+    file_content: Optional[bytes],
+    image_phash: Optional[str],
+    location_scope: str,
+    latitude: Optional[float],
+    longitude: Optional[float],
+    user_id: Optional[str],
+) -> dict[str, Any]:
+    """Full image analysis for a cache miss, ending with the canonical history row.
+
+    Runs as the singleflight leader task, so it finishes and stores the cache
+    entry even if the client that started it disconnects.
+    """
+    # Read the image, then fetch weather and preprocess concurrently.
+    if file_content is None:
+        with trace.stage("file_read"):
+            async with aiofiles.open(file_path, "rb") as f:
+                file_content = await f.read()
+
+    weather_context, (vision_payload, preprocessed) = await asyncio.gather(
+        _load_weather_context(trace, latitude, longitude),
+        _preprocess_uploaded_image(req, trace, request.image_id, file_content),
+    )
+
+    # Perform analysis
+    with trace.stage("llm"):
+        result = await _get_leaf_analysis().analyze_leaf_image(
+            image_base64=vision_payload,
             language=request.language,
             location_context=weather_context.weather_summary if weather_context else None,
         )
 
-        if weather_context and weather_context.weather_summary:
-            weather_note = _build_weather_note(weather_context.weather_summary)
-            if not _contains_weather_reference(result.quick_summary):
-                result.quick_summary = f"{result.quick_summary} {weather_note}".strip()
-            if not _contains_weather_reference(result.immediate_action):
-                result.immediate_action = f"{result.immediate_action}\n\n{weather_note}".strip()
+    if weather_context and weather_context.weather_summary:
+        weather_note = _build_weather_note(weather_context.weather_summary)
+        if not _contains_weather_reference(result.quick_summary):
+            result.quick_summary = f"{result.quick_summary} {weather_note}".strip()
+        if not _contains_weather_reference(result.immediate_action):
+            result.immediate_action = f"{result.immediate_action}\n\n{weather_note}".strip()
 
-        result = _sanitize_image_result(result)
-    except Exception as e:
-        raise HTTPException(status_code=422, detail=f"Analysis failed: {str(e)}")
-
-    # Get user_id if logged in
-    user_id = None
-    if hasattr(req.state, "user") and req.state.user:
-        user_id = req.state.user.email
+    result = _sanitize_image_result(result)
+    lite = lite_mode_active()
 
     # Save analysis to history
-    try:
-        history_data = {
-            "_id": str(ObjectId()),
-            "analysis_type": "image",
+    history_data = {
+        "_id": str(ObjectId()),
+        "analysis_type": "image",
+        "image_id": request.image_id,
+        "user_id": user_id,
+        "request_data": {
             "image_id": request.image_id,
-            "user_id": user_id,
-            "request_data": {
-                "image_id": request.image_id,
-                "filename": image_doc["filename"],
-                "language": request.language,
-                "location": request.location.model_dump() if request.location else None,
-                "location_scope": location_scope,
-                "image_phash": image_phash,
-                "cache_hit": False,
-                "preprocessed": image_doc.get("preprocessed_file_path") is not None,
-                "weather_context": weather_context.weather_summary if weather_context else None,
-            },
-            "response_data": result.model_dump(),
-            "timestamp": datetime.now(),
-        }
-        await req.app.mongodb["analysis_history"].insert_one(history_data)
+            "filename": image_doc["filename"],
+            "language": request.language,
+            "location": request.location.model_dump() if request.location else None,
+            "location_scope": location_scope,
+            "image_phash": image_phash,
+            **phash_storage_fields(image_phash, prefix="image_phash"),
+            "cache_hit": False,
+            "preprocessed": preprocessed,
+            "weather_context": weather_context.weather_summary if weather_context else None,
+        },
+        "response_data": result.model_dump(),
+        "pipeline_details": dict(trace.details),
+        "lite_mode": lite,
+        "timestamp": datetime.now(),
+    }
+    try:
+        with trace.stage("history_write"):
+            history_data["stage_timings_ms"] = dict(trace.stages)
+            await req.app.mongodb["analysis_history"].insert_one(history_data)
+        # Lite answers are served but never become the cached answer for similar images.
+        if image_phash and not lite:
+            await _store_cached_image_analysis(
+                req,
+                image_phash=image_phash,
+                language=request.language,
+                location_scope=location_scope,
+                history_id=history_data["_id"],
+            )
     except Exception as e:
         # Log error but don't fail the request if history save fails
         logger.warning(f"Failed to save analysis history: {str(e)}")
 
-    return result
+    return {
+        "history_id": history_data["_id"],
+        "response_data": history_data["response_data"],
+        "weather_context": history_data["request_data"]["weather_context"],
+        "lite_mode": lite,
+    }
 
 
 @router.get("/images/{image_id}/preprocessed-view")
@@ -463,19 +918,27 @@ async def view_preprocess_compare(
     )
 
 
-@router.post("/translate-image", response_model=ImageAnalysisLLMResponse)
+@router.post(
+    "/translate-image",
+    response_model=ImageAnalysisLLMResponse,
+    dependencies=[Depends(analysis_admission("verifier"))],
+)
 async def translate_image_analysis(
     req: Request,
     request: ImageAnalysisTranslationRequest,
 ):
     """Translate an already generated image analysis response using final verifier model only."""
+    start_deadline(settings.TRANSLATE_DEADLINE_SECONDS)
     try:
-        result = _get_leaf_analysis().translate_image_analysis(
-            response=request.response,
-            source_language=request.source_language,
-            target_language=request.target_language,
-        )
+        async with deadline_scope("translate"):
+            result = await _get_leaf_analysis().translate_image_analysis(
+                response=request.response,
+                source_language=request.source_language,
+                target_language=request.target_language,
+            )
         result = _sanitize_image_result(result)
+    except DeadlineExceeded as e:
+        raise _deadline_exceeded_error(e)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Translation failed: {str(e)}")
 
@@ -502,28 +965,194 @@ async def translate_image_analysis(
     return result
 
 
-@router.post("/symptoms", response_model=SymptomsAnalysisLLMResponse)
+async def _embed_symptoms(
+    trace: PipelineTrace,
+    symptoms_description: str,
+    plant_type: Optional[str],
+) -> Optional[list[float]]:
+    """Embed a symptoms request for the semantic cache; failures and timeouts just skip the cache."""
+    if not get_semantic_symptoms_cache().enabled:
+        return None
+    try:
+        with trace.stage("embed"):
+            return await asyncio.wait_for(
+                get_embedding_generator().agenerate_query_embedding(
+                    build_semantic_text(symptoms_description, plant_type)
+                ),
+                timeout=stage_timeout(settings.EMBED_TIMEOUT_SECONDS),
+            )
+    except TimeoutError:
+        logger.warning("Symptoms embedding timed out, skipping semantic cache")
+        trace.details["embed_dropped"] = True
+        return None
+    except Exception as e:
+        logger.warning(f"Symptoms embedding failed, skipping semantic cache: {str(e)}")
+        return None
+
+
+async def _shadow_verify_symptoms(
+    cached_response: dict[str, Any],
+    symptoms_description: str,
+    plant_type: Optional[str],
+    language: str,
+    location_context: Optional[str],
+) -> None:
+    """Re-run a semantic hit through the ensemble and score whether the cache agreed."""
+    # Runs after the response: queue behind interactive calls, with a budget of its own.
+    use_lane("batch")
+    start_deadline(settings.SYMPTOMS_DEADLINE_SECONDS)
+    semantic_cache = get_semantic_symptoms_cache()
+    try:
+        fresh = await _get_leaf_analysis().analyze_leaf_symptoms(
+            symptoms_description=symptoms_description,
+            plant_type=plant_type or "",
+            language=language,
+            location_context=location_context,
+        )
+    except Exception as e:
+        logger.warning(f"Semantic cache shadow check failed: {str(e)}")
+        return
+    agreed = same_diagnosis(cached_response, fresh.model_dump())
+    semantic_cache.record_shadow_check(agreed)
+    if not agreed:
+        logger.info(
+            "Semantic cache false hit: cached %r vs fresh %r for %r",
+            cached_response.get("likely_condition"),
+            fresh.likely_condition,
+            symptoms_description,
+        )
+
+
+_shadow_tasks: set[asyncio.Task] = set()
+
+
+def _background_context() -> contextvars.Context:
+    """Copy of the request context for work that outlives it.
+
+    Keeps the caller's scheduler identity, but not the request's trace (with its
+    SSE event queue), deadline or lite-mode decision.
+    """
+    context = contextvars.copy_context()
+    context.run(clear_trace)
+    context.run(start_deadline, 0)
+    context.run(reset_lite_mode)
+    return context
+
+
+def _maybe_schedule_shadow_check(**kwargs: Any) -> None:
+    if random.random() >= settings.SEMANTIC_CACHE_VERIFY_SAMPLE_RATE:
+        return
+    task = asyncio.create_task(_shadow_verify_symptoms(**kwargs), context=_background_context())
+    _shadow_tasks.add(task)
+    task.add_done_callback(_shadow_tasks.discard)
+
+
+@router.post(
+    "/symptoms",
+    response_model=SymptomsAnalysisLLMResponse,
+    dependencies=[Depends(analysis_admission("text"))],
+)
 async def analyze_symptoms(
     req: Request,
     request: SymptomsAnalysisRequest,
+    response: Response,
 ):
     """Analyze plant symptoms based on description"""
+    trace = start_trace()
+    result, cache_status = await _run_symptoms_analysis(req, request, trace)
+    _apply_trace_headers(response, trace, cache_status=cache_status)
+    return result
+
+
+@router.post("/symptoms/stream")
+async def analyze_symptoms_stream(
+    req: Request,
+    request: SymptomsAnalysisRequest,
+    slot: AdmissionSlot = Depends(analysis_admission("text")),
+):
+    """Analyze plant symptoms, streaming progress as Server-Sent Events"""
+    return _event_stream_response(lambda trace: _run_symptoms_analysis(req, request, trace), slot)
+
+
+async def _run_symptoms_analysis(
+    req: Request,
+    request: SymptomsAnalysisRequest,
+    trace: PipelineTrace,
+) -> tuple[SymptomsAnalysisLLMResponse, str]:
+    start_deadline(settings.SYMPTOMS_DEADLINE_SECONDS)
+    _identify_caller(req)
+    reset_lite_mode()
     latitude, longitude = _extract_coordinates(request)
-    weather_context = await asyncio.to_thread(
-        build_location_weather_context_for_coordinates,
-        latitude,
-        longitude,
+    weather_context = await _load_weather_context(trace, latitude, longitude)
+    location_context = weather_context.weather_summary if weather_context else None
+    weather_bucket = climate_risk_bucket(weather_context)
+
+    cache = get_symptoms_cache()
+    cache_key = symptoms_cache_key(
+        symptoms_description=request.symptoms_description,
+        plant_type=request.plant_type,
+        language=request.language,
+        weather_bucket=weather_bucket,
     )
+    with trace.stage("cache_lookup"):
+        cached_response = cache.get(cache_key)
+    cache_status = "hit" if cached_response is not None else "miss"
+
+    semantic_cache = get_semantic_symptoms_cache()
+    semantic_scope = (request.language, weather_bucket)
+    semantic_similarity = None
+    embedding = None
+    if cached_response is None:
+        embedding = await _embed_symptoms(trace, request.symptoms_description, request.plant_type)
+        if embedding is not None:
+            with trace.stage("semantic_lookup"):
+                match = semantic_cache.lookup(semantic_scope, embedding)
+            if match is not None:
+                cached_response = match.value
+                semantic_similarity = match.similarity
+                cache_status = "semantic"
+                cache.set(cache_key, cached_response)
+                _maybe_schedule_shadow_check(
+                    cached_response=cached_response,
+                    symptoms_description=request.symptoms_description,
+                    plant_type=request.plant_type,
+                    language=request.language,
+                    location_context=location_context,
+                )
 
     # Perform symptoms analysis
+    lite = False
     try:
-        result = _get_leaf_analysis().analyze_leaf_symptoms(
-            symptoms_description=request.symptoms_description,
-            plant_type=request.plant_type or "",
-            language=request.language,
-            location_context=weather_context.weather_summary if weather_context else None,
-        )
-        result = _sanitize_symptoms_result(result)
+        if cached_response is not None:
+            result = SymptomsAnalysisLLMResponse.model_validate(cached_response)
+        else:
+            async def run_analysis() -> tuple[dict[str, Any], bool]:
+                with trace.stage("llm"):
+                    fresh = await _get_leaf_analysis().analyze_leaf_symptoms(
+                        symptoms_description=request.symptoms_description,
+                        plant_type=request.plant_type or "",
+                        language=request.language,
+                        location_context=location_context,
+                    )
+                fresh_response = _sanitize_symptoms_result(fresh).model_dump()
+                fresh_lite = lite_mode_active()
+                if not fresh_lite:
+                    cache.set(cache_key, fresh_response)
+                    if embedding is not None:
+                        semantic_cache.add(semantic_scope, embedding, fresh_response)
+                return fresh_response, fresh_lite
+
+            async with deadline_scope("analysis"):
+                (fresh_response, lite), coalesced = await get_singleflight("symptoms").do(
+                    cache_key, run_analysis
+                )
+            if coalesced:
+                cache_status = "coalesced"
+            result = SymptomsAnalysisLLMResponse.model_validate(fresh_response)
+            if lite:
+                trace.details["lite_mode"] = True
+    except DeadlineExceeded as e:
+        raise _deadline_exceeded_error(e)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Analysis failed: {str(e)}")
 
@@ -534,49 +1163,113 @@ async def analyze_symptoms(
 
     # Save to history
     try:
-        history_data = {
-            "_id": str(ObjectId()),
-            "analysis_type": "symptoms",
-            "user_id": user_id,
-            "request_data": {
-                "symptoms_description": request.symptoms_description,
-                "plant_type": request.plant_type,
-                "language": request.language,
-                "location": request.location.model_dump() if request.location else None,
-                "weather_context": weather_context.weather_summary if weather_context else None,
-            },
-            "response_data": result.model_dump(),
-            "timestamp": datetime.now(),
-        }
-        await req.app.mongodb["analysis_history"].insert_one(history_data)
+        with trace.stage("history_write"):
+            history_data = {
+                "_id": str(ObjectId()),
+                "analysis_type": "symptoms",
+                "user_id": user_id,
+                "request_data": {
+                    "symptoms_description": request.symptoms_description,
+                    "plant_type": request.plant_type,
+                    "language": request.language,
+                    "location": request.location.model_dump() if request.location else None,
+                    "weather_context": location_context,
+                    "cache_hit": cache_status != "miss",
+                    "coalesced": cache_status == "coalesced",
+                    "semantic_similarity": semantic_similarity,
+                },
+                "response_data": result.model_dump(),
+                "pipeline_details": dict(trace.details),
+                "lite_mode": lite,
+                "stage_timings_ms": dict(trace.stages),
+                "timestamp": datetime.now(),
+            }
+            await req.app.mongodb["analysis_history"].insert_one(history_data)
     except Exception as e:
         # Log error but don't fail the request if history save fails
         logger.warning(f"Failed to save symptoms analysis history: {str(e)}")
 
-    return result
+    return result, cache_status
 
 
-@router.post("/care-tips", response_model=PlantCareLLMResponse)
+@router.post(
+    "/care-tips",
+    response_model=PlantCareLLMResponse,
+    dependencies=[Depends(analysis_admission("text"))],
+)
 async def get_care_tips(
     req: Request,
     request: PlantCareRequest,
+    response: Response,
 ):
     """Get care tips for a specific plant type"""
+    trace = start_trace()
+    result, cache_status = await _run_care_tips(req, request, trace)
+    _apply_trace_headers(response, trace, cache_status=cache_status)
+    return result
+
+
+@router.post("/care-tips/stream")
+async def get_care_tips_stream(
+    req: Request,
+    request: PlantCareRequest,
+    slot: AdmissionSlot = Depends(analysis_admission("text")),
+):
+    """Get care tips for a plant type, streaming progress as Server-Sent Events"""
+    return _event_stream_response(lambda trace: _run_care_tips(req, request, trace), slot)
+
+
+async def _run_care_tips(
+    req: Request,
+    request: PlantCareRequest,
+    trace: PipelineTrace,
+) -> tuple[PlantCareLLMResponse, str]:
+    start_deadline(settings.CARE_TIPS_DEADLINE_SECONDS)
+    _identify_caller(req)
+    reset_lite_mode()
     latitude, longitude = _extract_coordinates(request)
-    weather_context = await asyncio.to_thread(
-        build_location_weather_context_for_coordinates,
-        latitude,
-        longitude,
+    weather_context = await _load_weather_context(trace, latitude, longitude)
+
+    cache = get_care_cache()
+    cache_key = care_cache_key(
+        plant_type=request.plant_type,
+        language=request.language,
+        weather_bucket=climate_risk_bucket(weather_context),
     )
+    with trace.stage("cache_lookup"):
+        cached_response = cache.get(cache_key)
+    cache_status = "hit" if cached_response is not None else "miss"
 
     # Get care tips
+    lite = False
     try:
-        result = _get_leaf_analysis().get_plant_care_tips(
-            plant_type=request.plant_type,
-            language=request.language,
-            location_context=weather_context.weather_summary if weather_context else None,
-        )
-        result = _sanitize_care_result(result)
+        if cached_response is not None:
+            result = PlantCareLLMResponse.model_validate(cached_response)
+        else:
+            async def run_care_tips() -> tuple[dict[str, Any], bool]:
+                with trace.stage("llm"):
+                    fresh = await _get_leaf_analysis().get_plant_care_tips(
+                        plant_type=request.plant_type,
+                        language=request.language,
+                        location_context=weather_context.weather_summary if weather_context else None,
+                    )
+                fresh_response = _sanitize_care_result(fresh).model_dump()
+                fresh_lite = lite_mode_active()
+                if not fresh_lite:
+                    cache.set(cache_key, fresh_response)
+                return fresh_response, fresh_lite
+
+            async with deadline_scope("analysis"):
+                (fresh_response, lite), coalesced = await get_singleflight("care").do(
+                    cache_key, run_care_tips
+                )
+            if coalesced:
+                cache_status = "coalesced"
+            result = PlantCareLLMResponse.model_validate(fresh_response)
+            if lite:
+                trace.details["lite_mode"] = True
+    except DeadlineExceeded as e:
+        raise _deadline_exceeded_error(e)
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Failed to get care tips: {str(e)}")
 
@@ -587,25 +1280,63 @@ async def get_care_tips(
 
     # Save to history
     try:
-        history_data = {
-            "_id": str(ObjectId()),
-            "analysis_type": "care",
-            "user_id": user_id,
-            "request_data": {
-                "plant_type": request.plant_type,
-                "language": request.language,
-                "location": request.location.model_dump() if request.location else None,
-                "weather_context": weather_context.weather_summary if weather_context else None,
-            },
-            "response_data": result.model_dump(),
-            "timestamp": datetime.now(),
-        }
-        await req.app.mongodb["analysis_history"].insert_one(history_data)
+        with trace.stage("history_write"):
+            history_data = {
+                "_id": str(ObjectId()),
+                "analysis_type": "care",
+                "user_id": user_id,
+                "request_data": {
+                    "plant_type": request.plant_type,
+                    "language": request.language,
+                    "location": request.location.model_dump() if request.location else None,
+                    "weather_context": weather_context.weather_summary if weather_context else None,
+                    "cache_hit": cache_status != "miss",
+                    "coalesced": cache_status == "coalesced",
+                },
+                "response_data": result.model_dump(),
+                "pipeline_details": dict(trace.details),
+                "lite_mode": lite,
+                "stage_timings_ms": dict(trace.stages),
+                "timestamp": datetime.now(),
+            }
+            await req.app.mongodb["analysis_history"].insert_one(history_data)
     except Exception as e:
         # Log error but don't fail the request if history save fails
         logger.warning(f"Failed to save care tips history: {str(e)}")
 
-    return result
+    return result, cache_status
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(req: Request):
+    """Report response cache, pHash index and request coalescing counters."""
+    return {
+        "symptoms": get_symptoms_cache().stats(),
+        "care": get_care_cache().stats(),
+        "symptoms_semantic": get_semantic_symptoms_cache().stats(),
+        "singleflight": singleflight_stats(),
+        "phash_index_entries": len(req.app.phash_index),
+    }
+
+
+@router.get("/pipeline/stats")
+async def get_pipeline_stats():
+    """Report verifier skips, LLM queue depth and waits, load shedding, lite mode and vision payload sizes."""
+    return {
+        "text_path": text_path_stats(),
+        "vision_merge": vision_merge_stats(),
+        "scheduler": scheduler_stats(),
+        "admission": admission_stats(),
+        "degradation": degradation_stats(),
+        "vision_payload": vision_payload_stats(),
+    }
+
+
+@router.get("/pipeline/models")
+@superuser_required
+async def get_model_pool_health(req: Request):
+    """Report per-model latency, error rate and circuit state (superusers only)."""
+    return model_pool_health()
 
 
 @router.get("/images")
@@ -31,8 +31,93 @@ class Settings(BaseSettings):
     OPENROUTER_EMBEDDING_MODEL: str = "text-embedding-3-small"
     OPENROUTER_TEXT_MAX_TOKENS: int = 8000
     OPENROUTER_VISION_MAX_TOKENS: int = 12000
+    # One pooled keep-alive client shared by every OpenRouter model and the embeddings.
+    OPENROUTER_MAX_CONNECTIONS: int = 100
+    OPENROUTER_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENROUTER_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    OPENROUTER_TIMEOUT_SECONDS: float = 120.0
+    # Used when the h2 package is installed.
+    OPENROUTER_HTTP2: bool = True
+    # Merge vision experts once this many have answered (0 = wait for every expert)...
+    VISION_ENSEMBLE_QUORUM: int = 2
+    # ...or once this many seconds have passed with at least one answer (0 = no deadline).
+    VISION_ENSEMBLE_DEADLINE_SECONDS: float = 25.0
+    # Agreeing structured vision answers from at least this many experts skip the verifier.
+    VISION_CONSENSUS_MIN_EXPERTS: int = 2
+    # "progressive": ask one vision expert first and escalate only when it is unsure.
+    VISION_ENSEMBLE_POLICY: Literal["parallel", "progressive"] = "parallel"
+    VISION_PROGRESSIVE_ACCEPT_CONFIDENCE: list[Literal["High", "Medium", "Low"]] = ["High"]
+    VISION_PROGRESSIVE_ESCALATE_SEVERE: bool = True
+    # Per-model health: rolling window of calls used for latency percentiles and error rate.
+    MODEL_HEALTH_WINDOW: int = 50
+    # Calls needed before a model is routed by its observed median latency.
+    MODEL_HEALTH_MIN_SAMPLES: int = 5
+    # Consecutive failures that open a model's circuit, and seconds before a probe is let through.
+    MODEL_CIRCUIT_FAILURE_THRESHOLD: int = 3
+    MODEL_CIRCUIT_COOLDOWN_SECONDS: float = 30.0
+    # Concurrent calls per model per worker; extra calls queue fairly across users.
+    LLM_MODEL_CONCURRENCY: int = 8
+    LLM_MODEL_CONCURRENCY_OVERRIDES: dict[str, int] = {}
+    # Queue share of all anonymous callers from one IP relative to a signed-in user.
+    LLM_ANONYMOUS_WEIGHT: float = 0.5
+    # Per-request budgets for the analysis endpoints (0 = no deadline); expiry returns 504.
+    ANALYZE_DEADLINE_SECONDS: float = 90.0
+    SYMPTOMS_DEADLINE_SECONDS: float = 60.0
+    CARE_TIPS_DEADLINE_SECONDS: float = 60.0
+    TRANSLATE_DEADLINE_SECONDS: float = 45.0
+    # Weather lookups are dropped after this long, or sooner when the budget is nearly spent.
+    WEATHER_TIMEOUT_SECONDS: float = 5.0
+    # Symptoms embeddings are dropped after this long and the semantic cache is skipped.
+    EMBED_TIMEOUT_SECONDS: float = 3.0
+    # Budget a verifier pass needs; with less left the best local answer is returned unverified.
+    VERIFIER_MIN_SECONDS: float = 15.0
+    # Load shedding for analysis endpoints (0 disables each check); rejections carry Retry-After.
+    ANALYSIS_MAX_IN_FLIGHT: int = 64
+    ANALYSIS_MAX_IN_FLIGHT_PER_CALLER: int = 4
+    # Anonymous callers are grouped by client IP, so one bucket may hold many people.
+    ANALYSIS_MAX_IN_FLIGHT_PER_ANONYMOUS_IP: int = 16
+    # Refuse new analyses once the expected LLM queue wait exceeds this many seconds.
+    ANALYSIS_QUEUE_WAIT_SLO_SECONDS: float = 20.0
+    # Lite mode (one expert, no verifier, shorter answers) starts when the primary models'
+    # median latency or the queued model calls reach ENTER, and ends below both EXIT values.
+    LITE_MODE_ENABLED: bool = True
+    LITE_MODE_ENTER_LATENCY_SECONDS: float = 40.0
+    LITE_MODE_EXIT_LATENCY_SECONDS: float = 20.0
+    LITE_MODE_ENTER_QUEUE_DEPTH: int = 32
+    LITE_MODE_EXIT_QUEUE_DEPTH: int = 4
+    LITE_MODE_MIN_SECONDS: float = 60.0
+    # Vision experts get the leaf's bounding box plus this fraction of padding per side.
+    VISION_ROI_CROP: bool = True
+    VISION_ROI_PADDING: float = 0.08
+    # Longest edge and JPEG quality of the image each vision expert receives, per-model overrides by ID.
+    VISION_IMAGE_MAX_EDGE: int = 1024
+    VISION_IMAGE_JPEG_QUALITY: int = 85
+    VISION_IMAGE_MAX_EDGE_OVERRIDES: dict[str, int] = {}
+    VISION_IMAGE_JPEG_QUALITY_OVERRIDES: dict[str, int] = {}
     PHASH_HAMMING_DISTANCE_THRESHOLD: int = 4
-    PHASH_CACHE_MAX_CANDIDATES: int = 300
+    # "memory": per-process pHash index; "mongo": indexed band lookup shared across nodes.
+    PHASH_CACHE_LOOKUP: Literal["memory", "mongo"] = "memory"
+    # Per-worker cap on the in-memory index (under 100 bytes per entry, 0 = unbounded); oldest entries go first.
+    PHASH_INDEX_MAX_ENTRIES: int = 1_000_000
+    # Translate a same-scope cached analysis from another language instead of re-running vision.
+    PHASH_CACHE_CROSS_LANGUAGE: bool = True
+    # Cache entries unused for this long are evicted by a TTL index.
+    ANALYSIS_CACHE_TTL_DAYS: int = 30
+    # In-process exact-match caches for symptoms and care-tips responses.
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2000
+    RESPONSE_CACHE_SYMPTOMS_TTL_SECONDS: int = 60 * 60 * 6
+    RESPONSE_CACHE_CARE_TTL_SECONDS: int = 60 * 60 * 24
+    # Nearest-neighbour reuse of symptoms answers by embedding cosine similarity.
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_SIMILARITY_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 500
+    # Fraction of semantic hits re-analysed in the background to measure false hits.
+    SEMANTIC_CACHE_VERIFY_SAMPLE_RATE: float = 0.05
+    # 0 = one worker process per CPU core
+    IMAGE_WORKER_PROCESSES: int = 0
+    IMAGE_WORKER_OPENCV_THREADS: int = 1
+    # Threads for blocking I/O such as weather lookups (the event loop's default executor).
+    IO_THREAD_WORKERS: int = 16
     # 60 minutes * 24 hours * 20 days = 20  days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 20
     FRONTEND_HOST: str = "http://localhost:3000"
@@ -0,0 +1,95 @@
+"""Per-request deadline budget shared by every stage of an analysis.
+
+Each analysis endpoint starts a deadline from its ``*_DEADLINE_SECONDS``
+setting. Like the pipeline trace it lives in a context variable, so weather,
+preprocessing, the ensemble experts and the verifier can all check how much of
+the budget is left without threading it through every call. Optional stages
+shrink or drop out as the budget runs low; work that cannot finish in time
+raises ``DeadlineExceeded``, which the routes turn into a 504.
+
+Tasks started during the request (including singleflight leaders) copy the
+context, so they inherit the deadline of the request that started them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline ran out while ``stage`` was still running."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+@dataclass
+class Deadline:
+    budget_seconds: float
+    started_at: float = field(default_factory=time.monotonic)
+
+    def remaining(self) -> float:
+        return self.budget_seconds - (time.monotonic() - self.started_at)
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def start_deadline(budget_seconds: float) -> Optional[Deadline]:
+    """Start this request's deadline; a budget of 0 or less means no deadline."""
+    deadline = Deadline(budget_seconds) if budget_seconds > 0 else None
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without a deadline."""
+    deadline = _current_deadline.get()
+    return max(deadline.remaining(), 0.0) if deadline is not None else None
+
+
+def has_time_for(seconds: float) -> bool:
+    """Whether at least ``seconds`` of the budget remain (always true without a deadline)."""
+    remaining = remaining_seconds()
+    return remaining is None or remaining >= seconds
+
+
+def stage_timeout(cap: Optional[float] = None) -> Optional[float]:
+    """Timeout for a stage: the remaining budget, optionally capped at ``cap`` seconds."""
+    remaining = remaining_seconds()
+    if remaining is None:
+        return cap
+    return remaining if cap is None else min(cap, remaining)
+
+
+@asynccontextmanager
+async def deadline_scope(stage: str) -> AsyncIterator[None]:
+    """Cancel the enclosed work when the request deadline passes.
+
+    Cancellation propagates through the ``except Exception`` handlers of the
+    wrapped calls, and surfaces here as ``DeadlineExceeded(stage)``.
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        yield
+        return
+    if remaining <= 0:
+        raise DeadlineExceeded(stage)
+    timeout = asyncio.timeout(remaining)
+    try:
+        async with timeout:
+            yield
+    except TimeoutError as exc:
+        if isinstance(exc, DeadlineExceeded) or not timeout.expired():
+            raise
+        raise DeadlineExceeded(stage) from exc
@@ -0,0 +1,85 @@
+"""Per-request pipeline tracing for the analysis routes.
+
+Records how long each pipeline stage took so responses can report which stages
+ran (via the ``Server-Timing`` header) and history rows can keep the timings
+for comparing cache-hit latency against full analyses.
+
+``start_trace`` also publishes the trace through a context variable so the LLM
+layer can attach details (such as which ensemble experts contributed) without
+threading the trace through every call. Streaming endpoints attach an event
+queue, and stage boundaries plus anything passed to ``emit`` become progress
+events for the client.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+
+@dataclass
+class PipelineTrace:
+    stages: dict[str, float] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+    details: dict[str, Any] = field(default_factory=dict)
+    events: Optional[asyncio.Queue] = None
+
+    @property
+    def streaming(self) -> bool:
+        return self.events is not None
+
+    def emit(self, event: str, **data: Any) -> None:
+        """Publish a progress event when a streaming client is listening."""
+        if self.events is not None:
+            self.events.put_nowait({"event": event, **data})
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage; repeated stages accumulate."""
+        start = time.perf_counter()
+        self.emit("stage", stage=name, status="started")
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed_ms, 1)
+            self.emit("stage", stage=name, status="done", duration_ms=round(elapsed_ms, 1))
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started_at) * 1000, 1)
+
+    def server_timing_header(self) -> str:
+        """Render stages in W3C Server-Timing format, ending with the total."""
+        parts = [f"{name};dur={duration}" for name, duration in self.stages.items()]
+        parts.append(f"total;dur={self.elapsed_ms()}")
+        return ", ".join(parts)
+
+
+_current_trace: ContextVar[Optional[PipelineTrace]] = ContextVar("pipeline_trace", default=None)
+
+
+def start_trace(events: Optional[asyncio.Queue] = None) -> PipelineTrace:
+    """Create a trace and make it the current one for this request's context."""
+    trace = PipelineTrace(events=events)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[PipelineTrace]:
+    return _current_trace.get()
+
+
+def clear_trace() -> None:
+    """Detach this context from its request's trace, e.g. for work that outlives the request."""
+    _current_trace.set(None)
+
+
+def emit_event(event: str, **data: Any) -> None:
+    """Emit a progress event on the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.emit(event, **data)
@@ -0,0 +1,175 @@
+"""Compact pHash cache collection for image analysis reuse.
+
+Each entry maps ``(language, location_scope, phash)`` to the history row that
+holds the canonical response, plus hit counters. Lookups are served by the
+``analysis_cache_lookup`` compound index instead of scanning
+``analysis_history``; entries that go unused for
+``ANALYSIS_CACHE_TTL_DAYS`` are evicted by a TTL index on ``last_used_at``.
+
+Entries also store the pHash as an int64 plus four indexed 16-bit bands so
+near-duplicates can be found with an indexed ``$or`` on the bands when the
+resident in-process index is not shared between nodes.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.asynchronous.database import AsyncDatabase
+
+from app.core.config import settings
+from app.utils.image_hashing import (
+    PHASH_BAND_COUNT,
+    PHashMatch,
+    band_neighbours,
+    band_probe_radius,
+    phash_bands,
+    phash_from_int64,
+    phash_hex_to_int,
+    phash_storage_fields,
+)
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_COLLECTION = "analysis_cache"
+ANALYSIS_CACHE_TTL_INDEX = "analysis_cache_ttl"
+
+
+async def create_indexes(mongodb: AsyncDatabase) -> None:
+    collection = mongodb[ANALYSIS_CACHE_COLLECTION]
+    # Covers the exact lookup and returns history_id without touching documents.
+    await collection.create_index(
+        [
+            ("language", ASCENDING),
+            ("location_scope", ASCENDING),
+            ("phash", ASCENDING),
+            ("history_id", ASCENDING),
+        ],
+        name="analysis_cache_lookup",
+    )
+    for band in range(PHASH_BAND_COUNT):
+        await collection.create_index(
+            [
+                ("language", ASCENDING),
+                ("location_scope", ASCENDING),
+                (f"phash_band_{band}", ASCENDING),
+            ],
+            name=f"analysis_cache_band_{band}",
+        )
+    ttl_seconds = settings.ANALYSIS_CACHE_TTL_DAYS * 24 * 60 * 60
+    ttl_index = (await collection.index_information()).get(ANALYSIS_CACHE_TTL_INDEX)
+    if ttl_index is not None and ttl_index.get("expireAfterSeconds") != ttl_seconds:
+        # create_index refuses to change an existing index's options; collMod updates it in place.
+        await mongodb.command(
+            "collMod",
+            ANALYSIS_CACHE_COLLECTION,
+            index={"name": ANALYSIS_CACHE_TTL_INDEX, "expireAfterSeconds": ttl_seconds},
+        )
+        logger.info(
+            "analysis_cache TTL changed from %ss to %ss",
+            ttl_index.get("expireAfterSeconds"),
+            ttl_seconds,
+        )
+        return
+    await collection.create_index(
+        [("last_used_at", ASCENDING)],
+        name=ANALYSIS_CACHE_TTL_INDEX,
+        expireAfterSeconds=ttl_seconds,
+    )
+
+
+async def upsert_entry(
+    mongodb: AsyncDatabase,
+    *,
+    phash: str,
+    language: str,
+    location_scope: str,
+    history_id: str,
+    created_at: Optional[datetime] = None,
+) -> None:
+    """Point the cache key at a new canonical analysis, keeping existing hit counters."""
+    now = datetime.now()
+    await mongodb[ANALYSIS_CACHE_COLLECTION].update_one(
+        {"language": language, "location_scope": location_scope, "phash": phash},
+        {
+            "$set": {
+                "history_id": history_id,
+                "last_used_at": now,
+                **phash_storage_fields(phash),
+            },
+            "$setOnInsert": {"created_at": created_at or now, "hit_count": 0},
+        },
+        upsert=True,
+    )
+
+
+async def record_hit(
+    mongodb: AsyncDatabase,
+    *,
+    phash: str,
+    language: str,
+    location_scope: str,
+) -> Optional[dict[str, Any]]:
+    """Bump hit counters and refresh the TTL; returns None if the entry was evicted."""
+    return await mongodb[ANALYSIS_CACHE_COLLECTION].find_one_and_update(
+        {"language": language, "location_scope": location_scope, "phash": phash},
+        {"$inc": {"hit_count": 1}, "$set": {"last_used_at": datetime.now()}},
+        projection={"_id": 0, "history_id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def delete_entry(
+    mongodb: AsyncDatabase,
+    *,
+    phash: str,
+    language: str,
+    location_scope: str,
+) -> None:
+    await mongodb[ANALYSIS_CACHE_COLLECTION].delete_one(
+        {"language": language, "location_scope": location_scope, "phash": phash}
+    )
+
+
+async def find_nearest(
+    mongodb: AsyncDatabase,
+    *,
+    phash: str,
+    language: str,
+    location_scope: str,
+    max_distance: int,
+) -> Optional[PHashMatch]:
+    """Find the closest entry within ``max_distance`` bits using the band indexes.
+
+    Any hash within ``max_distance`` shares at least one band that differs in at
+    most ``max_distance // PHASH_BAND_COUNT`` bits, so probing those band values
+    returns a complete candidate set; candidates are then checked exactly.
+    """
+    value = phash_hex_to_int(phash)
+    if value is None:
+        return None
+
+    probe_radius = band_probe_radius(max_distance)
+    band_filters = [
+        {f"phash_band_{index}": {"$in": list(band_neighbours(band, probe_radius))}}
+        for index, band in enumerate(phash_bands(value))
+    ]
+    cursor = mongodb[ANALYSIS_CACHE_COLLECTION].find(
+        {"language": language, "location_scope": location_scope, "$or": band_filters},
+        {"_id": 0, "phash_int": 1, "history_id": 1},
+    )
+
+    best: Optional[PHashMatch] = None
+    async for doc in cursor:
+        if doc.get("phash_int") is None:
+            continue
+        candidate = phash_from_int64(int(doc["phash_int"]))
+        distance = (candidate ^ value).bit_count()
+        if distance > max_distance:
+            continue
+        if best is None or distance < best.distance:
+            best = PHashMatch(entry_id=str(doc["history_id"]), distance=distance, phash=candidate)
+    return best
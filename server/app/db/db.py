@@ -2,6 +2,7 @@ import logging
 from pymongo import AsyncMongoClient, ASCENDING, DESCENDING
 from fastapi import FastAPI
 from app.core.config import settings
+from app.db import analysis_cache, migrations
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,9 @@ async def connect(app: FastAPI) -> None:
     await mongodb["analysis_history"].create_index([("timestamp", DESCENDING)])
     await mongodb["analysis_history"].create_index([("analysis_type", ASCENDING)])
     await mongodb["analysis_history"].create_index([("image_id", ASCENDING)])
+    await analysis_cache.create_indexes(mongodb)
+
+    migrations.start(app)
 
     logger.info(f"Database connected to {settings.MONGODB_DB_NAME}")
 
@@ -0,0 +1,212 @@
+"""One-off data migrations, applied in the background and tracked in ``migrations``.
+
+Every worker starts the runner at startup without waiting for it. Each migration
+is claimed with an upsert on its ``migrations`` document before it runs, so when
+several workers or replicas start together exactly one of them applies it; the
+others see the claim (or a ``DuplicateKeyError`` from the racing upsert) and
+skip it. A claim is a lease that the runner renews between batches; if its
+worker dies, the lease expires and the next worker to start resumes the
+migration. Backfills are idempotent and work in batches of
+``MIGRATION_BATCH_SIZE`` documents.
+
+Run manually with ``python -m app.db.migrations``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi import FastAPI
+from pymongo import AsyncMongoClient, UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.db import analysis_cache
+from app.utils.image_hashing import phash_storage_fields
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "migrations"
+BACKFILL_ANALYSIS_CACHE = "0001_backfill_analysis_cache"
+MIGRATION_BATCH_SIZE = 500
+# A claim not renewed for this long belongs to a dead worker and can be taken over.
+MIGRATION_LEASE = timedelta(minutes=5)
+
+Renew = Callable[[], Awaitable[None]]
+
+
+async def _batches(cursor: Any, size: int = MIGRATION_BATCH_SIZE) -> AsyncIterator[list[dict]]:
+    batch: list[dict] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def backfill_analysis_cache(mongodb: AsyncDatabase, renew: Renew) -> int:
+    """Create analysis_cache entries from canonical image analyses in history."""
+    cursor = mongodb["analysis_history"].find(
+        {
+            "analysis_type": "image",
+            "request_data.image_phash": {"$exists": True},
+            "request_data.cache_hit": {"$ne": True},
+            "response_data": {"$exists": True},
+        },
+        {
+            "request_data.image_phash": 1,
+            "request_data.language": 1,
+            "request_data.location_scope": 1,
+            "timestamp": 1,
+        },
+    ).sort("timestamp", 1)
+
+    # Oldest first so the newest analysis for a key wins. Entries get a fresh
+    # TTL window from now rather than being evicted immediately.
+    count = 0
+    async for batch in _batches(cursor):
+        for doc in batch:
+            request_data = doc.get("request_data") or {}
+            phash = request_data.get("image_phash")
+            if not phash:
+                continue
+            await analysis_cache.upsert_entry(
+                mongodb,
+                phash=phash,
+                language=request_data.get("language") or "en",
+                location_scope=request_data.get("location_scope") or "fallback",
+                history_id=str(doc["_id"]),
+                created_at=doc.get("timestamp"),
+            )
+            count += 1
+        await renew()
+    return count
+
+
+async def backfill_phash_bands(mongodb: AsyncDatabase, renew: Renew) -> int:
+    """Add int64 and band fields next to existing hex pHashes."""
+    targets = [
+        ("uploaded_images", "phash", "phash"),
+        ("analysis_history", "request_data.image_phash", "request_data.image_phash"),
+        (analysis_cache.ANALYSIS_CACHE_COLLECTION, "phash", "phash"),
+    ]
+    count = 0
+    for collection_name, hex_field, prefix in targets:
+        collection = mongodb[collection_name]
+        cursor = collection.find(
+            {hex_field: {"$exists": True}, f"{prefix}_int": {"$exists": False}},
+            {hex_field: 1},
+        )
+        async for batch in _batches(cursor):
+            updates = []
+            for doc in batch:
+                hash_hex = doc
+                for part in hex_field.split("."):
+                    hash_hex = (hash_hex or {}).get(part)
+                fields = phash_storage_fields(hash_hex, prefix=prefix)
+                if fields:
+                    updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+            if updates:
+                await collection.bulk_write(updates, ordered=False)
+                count += len(updates)
+            await renew()
+    return count
+
+
+MIGRATIONS: list[tuple[str, Callable[[AsyncDatabase, Renew], Awaitable[int]]]] = [
+    (BACKFILL_ANALYSIS_CACHE, backfill_analysis_cache),
+    ("0002_backfill_phash_bands", backfill_phash_bands),
+]
+
+
+async def is_applied(mongodb: AsyncDatabase, name: str) -> bool:
+    doc = await mongodb[MIGRATIONS_COLLECTION].find_one({"_id": name}, {"status": 1})
+    return doc is not None and doc.get("status") == "applied"
+
+
+async def _claim(mongodb: AsyncDatabase, name: str, owner: str) -> bool:
+    """Take the lease on a migration; False if it is applied or another worker holds it."""
+    now = datetime.now()
+    try:
+        # Applied migrations (and live claims) do not match, so the upsert tries
+        # to insert a second document with the same _id and fails.
+        await mongodb[MIGRATIONS_COLLECTION].find_one_and_update(
+            {"_id": name, "status": "running", "lease_until": {"$lt": now}},
+            {"$set": {"status": "running", "owner": owner, "lease_until": now + MIGRATION_LEASE}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def apply_pending(mongodb: AsyncDatabase) -> None:
+    """Run migrations that have not been applied or claimed yet, in order."""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    for name, migration in MIGRATIONS:
+        if not await _claim(mongodb, name, owner):
+            continue
+
+        async def renew(name: str = name) -> None:
+            await mongodb[MIGRATIONS_COLLECTION].update_one(
+                {"_id": name, "owner": owner},
+                {"$set": {"lease_until": datetime.now() + MIGRATION_LEASE}},
+            )
+
+        logger.info("Applying migration %s", name)
+        affected = await migration(mongodb, renew)
+        await mongodb[MIGRATIONS_COLLECTION].update_one(
+            {"_id": name, "owner": owner},
+            {
+                "$set": {"status": "applied", "affected": affected, "applied_at": datetime.now()},
+                "$unset": {"lease_until": ""},
+            },
+        )
+        logger.info("Applied migration %s (%s documents)", name, affected)
+
+
+async def _run_in_background(mongodb: AsyncDatabase) -> None:
+    try:
+        await apply_pending(mongodb)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        # The lease expires and a later startup retries the migration.
+        logger.exception("Data migrations failed")
+
+
+def start(app: FastAPI) -> None:
+    """Apply pending migrations in the background so startup does not wait on backfills."""
+    app.migrations_task = asyncio.create_task(_run_in_background(app.mongodb))
+
+
+async def shutdown(app: FastAPI) -> None:
+    task: Optional[asyncio.Task] = getattr(app, "migrations_task", None)
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _main() -> None:
+    client = AsyncMongoClient(str(settings.MONGODB_URI))
+    try:
+        await apply_pending(client.get_database(settings.MONGODB_DB_NAME))
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
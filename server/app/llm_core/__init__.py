@@ -10,11 +10,17 @@ from functools import lru_cache
 
 from .utils import LeafAnalysisUtils
 from .ensemble import (
+    close_model_clients,
     ensemble_invoke_text,
     ensemble_invoke_vision,
     get_single_model,
     get_vision_model,
+    model_pool_health,
+    text_path_stats,
+    vision_merge_stats,
 )
+from .degradation import degradation_stats
+from .scheduler import scheduler_stats
 
 
 @lru_cache(maxsize=1)
@@ -26,8 +32,14 @@ def get_leaf_analysis() -> LeafAnalysisUtils:
 __all__ = [
     "LeafAnalysisUtils",
     "get_leaf_analysis",
+    "close_model_clients",
+    "degradation_stats",
     "get_single_model",
     "get_vision_model",
     "ensemble_invoke_text",
     "ensemble_invoke_vision",
+    "model_pool_health",
+    "scheduler_stats",
+    "text_path_stats",
+    "vision_merge_stats",
 ]
@@ -0,0 +1,54 @@
+"""Deterministic local merge of structured vision expert answers.
+
+When every expert reports the same ``health_status`` and a matching
+``primary_issue``, the verifier model has nothing to resolve, so the answers
+are merged locally. The diagnosis and everything written about it (summary,
+actions, treatment, prevention, report) come from the most confident expert,
+preferring the fuller answer on ties, so the merged answer never pairs one
+expert's issue with another's treatment. Only fields that stand on their own
+are picked per expert. Disagreements return ``None`` and are left to the
+verifier.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from app.models.analysis import ImageAnalysisLLMResponse
+from app.utils.response_cache import word_overlap
+
+CONFIDENCE_RANK = {"Low": 0, "Medium": 1, "High": 2}
+# Share of words two primary_issue lines must have in common to count as the same issue.
+ISSUE_AGREEMENT_OVERLAP = 0.5
+# Fields that do not depend on the diagnosis, so each can come from a different expert.
+INDEPENDENT_FIELDS = ("plant_identification",)
+
+
+def experts_agree(responses: list[ImageAnalysisLLMResponse]) -> bool:
+    first = responses[0]
+    return all(
+        response.health_status == first.health_status
+        and word_overlap(response.primary_issue, first.primary_issue) >= ISSUE_AGREEMENT_OVERLAP
+        for response in responses[1:]
+    )
+
+
+def _rank(response: ImageAnalysisLLMResponse, field_name: str) -> tuple[int, int]:
+    value = getattr(response, field_name) or ""
+    return CONFIDENCE_RANK.get(response.confidence, 0), len(value.strip())
+
+
+def consensus_merge(
+    responses: list[ImageAnalysisLLMResponse],
+    min_experts: int = 2,
+) -> Optional[ImageAnalysisLLMResponse]:
+    """Merge agreeing expert answers, or return None when the verifier is needed."""
+    if len(responses) < max(min_experts, 1) or not experts_agree(responses):
+        return None
+
+    lead = max(responses, key=lambda response: _rank(response, "primary_issue"))
+    merged = lead.model_dump()
+    for field_name in INDEPENDENT_FIELDS:
+        best = max(responses, key=lambda response: _rank(response, field_name))
+        merged[field_name] = getattr(best, field_name)
+    return ImageAnalysisLLMResponse.model_validate(merged)
@@ -0,0 +1,132 @@
+"""Lite mode: single-expert analyses while the model pool is overloaded.
+
+The controller watches two signals: the observed median latency of the primary
+(first-routed) text and vision models, and the number of calls waiting in the
+LLM scheduler queues. When either crosses its ``LITE_MODE_ENTER_*`` threshold,
+new analyses switch to the lite path. That path uses one expert, no verifier
+or consensus merge, and shorter word limits. Lite mode ends once both signals
+are back under their lower ``LITE_MODE_EXIT_*`` thresholds and it has lasted
+``LITE_MODE_MIN_SECONDS``, so the mode does not flap around a single threshold.
+
+Each analysis decides its mode once, on first use, and keeps it in a context
+variable (like the trace and deadline). Its prompts and ensemble path therefore
+always agree, even if the controller switches mid-request.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.tracing import current_trace
+from app.llm_core.model_health import get_model_health
+from app.llm_core.scheduler import get_llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+_request_lite_mode: ContextVar[Optional[bool]] = ContextVar("analysis_lite_mode", default=None)
+
+
+class DegradationController:
+    """Hysteresis between full ensemble and lite mode for one worker."""
+
+    def __init__(self, primary_model_ids: dict[str, list[str]]) -> None:
+        self.primary_model_ids = primary_model_ids
+        self.lite = False
+        self.changed_at = time.monotonic()
+        self.entered = 0
+        self.lite_decisions = 0
+        self.full_decisions = 0
+        self.last_reason: Optional[str] = None
+
+    def _primary_latency(self) -> float:
+        """Slowest median latency among the models each pool would try first."""
+        registry = get_model_health()
+        latencies = [0.0]
+        for model_ids in self.primary_model_ids.values():
+            routed = registry.route(model_ids)
+            if routed:
+                latencies.append(registry.get(routed[0]).median_latency() or 0.0)
+        return max(latencies)
+
+    def evaluate(self) -> bool:
+        """Update and return the current mode from the latest latency and queue depth."""
+        if not settings.LITE_MODE_ENABLED:
+            self.lite = False
+            return False
+        now = time.monotonic()
+        latency = self._primary_latency()
+        queued = get_llm_scheduler().total_queued()
+        if not self.lite:
+            if latency >= settings.LITE_MODE_ENTER_LATENCY_SECONDS:
+                self._switch(True, now, f"primary model latency {latency:.1f}s")
+            elif queued >= settings.LITE_MODE_ENTER_QUEUE_DEPTH:
+                self._switch(True, now, f"{queued} queued model calls")
+        elif (
+            latency <= settings.LITE_MODE_EXIT_LATENCY_SECONDS
+            and queued <= settings.LITE_MODE_EXIT_QUEUE_DEPTH
+            and now - self.changed_at >= settings.LITE_MODE_MIN_SECONDS
+        ):
+            self._switch(False, now, "latency and queue depth recovered")
+        return self.lite
+
+    def _switch(self, lite: bool, now: float, reason: str) -> None:
+        self.lite = lite
+        self.changed_at = now
+        self.last_reason = reason
+        if lite:
+            self.entered += 1
+            logger.warning("Entering lite analysis mode: %s", reason)
+        else:
+            logger.info("Leaving lite analysis mode: %s", reason)
+
+    def decide(self) -> bool:
+        lite = self.evaluate()
+        if lite:
+            self.lite_decisions += 1
+        else:
+            self.full_decisions += 1
+        return lite
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "mode": "lite" if self.lite else "full",
+            "since_seconds": round(time.monotonic() - self.changed_at, 1),
+            "last_reason": self.last_reason,
+            "times_entered": self.entered,
+            "analyses": {"lite": self.lite_decisions, "full": self.full_decisions},
+            "primary_latency_seconds": round(self._primary_latency(), 2),
+            "queued_calls": get_llm_scheduler().total_queued(),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_degradation_controller() -> DegradationController:
+    from app.llm_core.ensemble import TEXT_ENSEMBLE_MODEL_IDS, VISION_ENSEMBLE_MODEL_IDS
+
+    return DegradationController({"text": TEXT_ENSEMBLE_MODEL_IDS, "vision": VISION_ENSEMBLE_MODEL_IDS})
+
+
+def reset_lite_mode() -> None:
+    """Start a new analysis: its mode is decided again on first use."""
+    _request_lite_mode.set(None)
+
+
+def lite_mode_active() -> bool:
+    """Whether the current analysis runs in lite mode; decided on first use per request."""
+    lite = _request_lite_mode.get()
+    if lite is None:
+        lite = get_degradation_controller().decide()
+        _request_lite_mode.set(lite)
+        trace = current_trace()
+        if lite and trace is not None:
+            trace.details["lite_mode"] = True
+    return lite
+
+
+def degradation_stats() -> dict[str, Any]:
+    return get_degradation_controller().stats()
@@ -1,29 +1,52 @@
 """OpenRouter ensemble helpers for text and vision analysis.
 
-Text analysis uses a lightweight primary model with a fallback model on failure.
-Vision analysis can still compare multiple small models, then a final verifier
-model cleans and validates the output.
+Text analysis uses a lightweight primary model with a fallback model on failure;
+its structured answer is returned directly unless it fails validation or the
+local quality checks, in which case the verifier repairs it.
+Vision analysis compares multiple small models; agreeing structured answers are
+merged locally and only disagreements go to the final verifier model. Every
+model call goes through ``ainvoke`` so the analysis routes never block the event
+loop while waiting on OpenRouter.
 """
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
 from functools import lru_cache
-from typing import Any, Optional, Type, TypeVar
+from typing import Any, Callable, Literal, Optional, Type, TypeVar
 
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel
 
 from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, deadline_scope, has_time_for, remaining_seconds
+from app.core.tracing import current_trace, emit_event
+from app.llm_core.consensus import CONFIDENCE_RANK, consensus_merge
+from app.llm_core.degradation import lite_mode_active
+from app.llm_core.json_repair import (
+    complete_truncated_output,
+    find_truncated_content,
+    salvage_partial_json,
+)
+from app.llm_core.model_health import abandon_model_call, get_model_health, model_call
+from app.llm_core.openrouter_model import (
+    close_http_clients,
+    get_structured_runnable,
+    openrouter_client_options,
+)
+from app.llm_core.scheduler import get_llm_scheduler
+from app.llm_core.vision_payload import VisionPayload, record_vision_call
+from app.models.analysis import ImageAnalysisLLMResponse
+
+logger = logging.getLogger(__name__)
 
 StructuredModel = TypeVar("StructuredModel", bound=BaseModel)
 
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
-OPENROUTER_DEFAULT_HEADERS = {
-    "HTTP-Referer": "https://leaf-disease-detection",
-    "X-Title": "Leaf Disease Detection",
-}
-
 # Keep model pools lightweight for testing.
 TEXT_ENSEMBLE_MODEL_IDS = [
     "meta-llama/llama-3.2-3b-instruct:free",
@@ -45,11 +68,10 @@ def _require_api_key() -> str:
 def _build_chat_model(model_id: str, *, max_tokens: int) -> ChatOpenAI:
     return ChatOpenAI(
         model=model_id,
-        base_url=OPENROUTER_BASE_URL,
         api_key=_require_api_key(),
         temperature=0.1,
-        default_headers=OPENROUTER_DEFAULT_HEADERS,
         max_tokens=max_tokens,
+        **openrouter_client_options(),
     )
 
 
@@ -77,6 +99,14 @@ def _get_final_verifier_model() -> ChatOpenAI:
     )
 
 
+async def close_model_clients() -> None:
+    """Drop the cached models and close their shared HTTP pools on shutdown."""
+    _get_text_models.cache_clear()
+    _get_vision_models.cache_clear()
+    _get_final_verifier_model.cache_clear()
+    await close_http_clients()
+
+
 def get_single_model() -> ChatOpenAI:
     """Return the final verifier model for compatibility with older code paths."""
     return _get_final_verifier_model()
@@ -95,69 +125,257 @@ def _extract_response_text(response: Any) -> str:
     return str(response).strip()
 
 
-def _invoke_one_text_model(model: ChatOpenAI, prompt: str, model_id: str) -> str:
+async def _invoke_one_text_model(model: ChatOpenAI, prompt: str, model_id: str) -> str:
     try:
-        response = model.invoke(prompt)
+        async with model_call(model_id):
+            response = await model.ainvoke(prompt)
         return _extract_response_text(response)
     except Exception as exc:
-        print(f"⚠️  Text model '{model_id}' failed: {exc}")
+        logger.warning("Text model '%s' failed: %s", model_id, exc)
         return ""
 
 
-def _invoke_one_vision_model(
+@dataclass(slots=True)
+class ExpertAnswer:
+    model_id: str
+    text: str
+    parsed: Optional[BaseModel] = None
+
+
+async def _invoke_one_vision_model(
     model: ChatOpenAI,
     prompt: str,
-    image_base64: str,
+    image: VisionPayload,
     model_id: str,
-) -> str:
+    schema: Optional[Type[StructuredModel]] = None,
+) -> ExpertAnswer:
+    model_image = image.for_model(model_id)
     messages = [
         HumanMessage(
             content=[
                 {"type": "text", "text": prompt},
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"},
+                    "image_url": {"url": f"data:image/jpeg;base64,{model_image.base64}"},
                 },
             ]
         )
     ]
 
     try:
-        response = model.invoke(messages)
-        return _extract_response_text(response)
+        async with model_call(model_id):
+            started = time.perf_counter()
+            if schema is None:
+                response = await model.ainvoke(messages)
+            else:
+                runnable = get_structured_runnable(model, schema, include_raw=True)
+                output = await runnable.ainvoke(messages)
+                response = output.get("raw")
+            latency = time.perf_counter() - started
     except Exception as exc:
-        print(f"⚠️  Vision model '{model_id}' failed: {exc}")
-        return ""
+        logger.warning("Vision model '%s' failed: %s", model_id, exc)
+        return ExpertAnswer(model_id=model_id, text="")
+    record_vision_call(model_id, model_image, latency, response)
+
+    if schema is None:
+        return ExpertAnswer(model_id=model_id, text=_extract_response_text(response))
+
+    parsed = output.get("parsed")
+    text = _extract_response_text(response)
+    if not text and parsed is not None:
+        text = parsed.model_dump_json()
+    return ExpertAnswer(model_id=model_id, text=text, parsed=parsed)
 
 
-def _run_text_with_fallback(prompt: str) -> str:
-    models = list(_get_text_models())
-    for index, model in enumerate(models):
-        response = _invoke_one_text_model(model, prompt, TEXT_ENSEMBLE_MODEL_IDS[index])
+async def _consult_vision_expert(
+    model: ChatOpenAI,
+    prompt: str,
+    image: VisionPayload,
+    model_id: str,
+    schema: Optional[Type[StructuredModel]] = None,
+) -> ExpertAnswer:
+    """Invoke one vision expert and report its outcome to streaming clients."""
+    answer = await _invoke_one_vision_model(model, prompt, image, model_id, schema=schema)
+    emit_event(
+        "expert",
+        model=model_id,
+        status="answered" if answer.text.strip() else "failed",
+        health_status=getattr(answer.parsed, "health_status", None),
+        primary_issue=getattr(answer.parsed, "primary_issue", None),
+    )
+    return answer
+
+
+def _route_models(
+    model_ids: list[str],
+    models: tuple[ChatOpenAI, ...],
+    **route_options: Any,
+) -> list[tuple[str, ChatOpenAI]]:
+    """Healthy ``(model_id, model)`` pairs, fastest first; see ``ModelHealthRegistry.route``."""
+    by_id = dict(zip(model_ids, models))
+    routed = get_model_health().route(model_ids, **route_options)
+    skipped = [model_id for model_id in model_ids if model_id not in routed]
+    trace = current_trace()
+    if skipped and trace is not None:
+        recorded = trace.details.setdefault("skipped_models", [])
+        recorded.extend(model_id for model_id in skipped if model_id not in recorded)
+    return [(model_id, by_id[model_id]) for model_id in routed]
+
+
+def model_pool_health() -> dict[str, Any]:
+    """Health, circuit state and routing order of every configured model."""
+    registry = get_model_health()
+    model_ids = dict.fromkeys(
+        [*TEXT_ENSEMBLE_MODEL_IDS, *VISION_ENSEMBLE_MODEL_IDS, FINAL_VERIFIER_MODEL_ID]
+    )
+    return {
+        "text_route": registry.route(TEXT_ENSEMBLE_MODEL_IDS),
+        "vision_route": registry.route(VISION_ENSEMBLE_MODEL_IDS),
+        "verifier": FINAL_VERIFIER_MODEL_ID,
+        "models": {model_id: registry.get(model_id).stats() for model_id in model_ids},
+    }
+
+
+def estimated_queue_wait(kind: Literal["text", "vision", "verifier"]) -> float:
+    """Expected scheduler wait in seconds before a new analysis gets its models.
+
+    Uses each model's queue and observed median latency; text waits for its
+    first routed model and vision for the quorum-th fastest expert. Models
+    without enough latency samples count as no wait.
+    """
+    registry = get_model_health()
+    scheduler = get_llm_scheduler()
+
+    def wait_for(model_id: str) -> float:
+        median = registry.get(model_id).median_latency()
+        return scheduler.estimated_wait(model_id, median) if median is not None else 0.0
+
+    if kind == "verifier":
+        return wait_for(FINAL_VERIFIER_MODEL_ID)
+    if kind == "text":
+        routed = registry.route(TEXT_ENSEMBLE_MODEL_IDS)
+        return wait_for(routed[0]) if routed else 0.0
+    waits = sorted(wait_for(model_id) for model_id in registry.route(VISION_ENSEMBLE_MODEL_IDS))
+    if not waits:
+        return 0.0
+    quorum = settings.VISION_ENSEMBLE_QUORUM or len(waits)
+    return waits[min(quorum, len(waits)) - 1]
+
+
+async def _run_text_with_fallback(prompt: str) -> str:
+    for model_id, model in _route_models(TEXT_ENSEMBLE_MODEL_IDS, _get_text_models()):
+        async with deadline_scope("text_model"):
+            response = await _invoke_one_text_model(model, prompt, model_id)
         if response:
             return response
     return ""
 
 
-def _run_parallel_vision(prompt: str, image_base64: str) -> list[str]:
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+def _record_experts(contributed: list[str], failed: list[str], cancelled: list[str]) -> None:
+    """Add expert outcomes to the request trace, extending earlier rounds."""
+    trace = current_trace()
+    if trace is None:
+        return
+    experts = trace.details.setdefault(
+        "vision_experts", {"contributed": [], "failed": [], "cancelled": []}
+    )
+    experts["contributed"].extend(contributed)
+    experts["failed"].extend(failed)
+    experts["cancelled"].extend(cancelled)
 
-    models = list(_get_vision_models())
-    with ThreadPoolExecutor(max_workers=len(models)) as pool:
-        futures = {
-            pool.submit(
-                _invoke_one_vision_model,
-                model,
-                prompt,
-                image_base64,
-                VISION_ENSEMBLE_MODEL_IDS[index],
-            ): index
-            for index, model in enumerate(models)
-        }
-        ordered = [""] * len(models)
-        for future in as_completed(futures):
-            ordered[futures[future]] = future.result()
-    return [item for item in ordered if item.strip()]
+
+async def _run_parallel_vision(
+    prompt: str,
+    image: VisionPayload,
+    schema: Optional[Type[StructuredModel]] = None,
+    consulted: tuple[str, ...] = (),
+) -> list[ExpertAnswer]:
+    """Query vision experts in parallel and return once the quorum or deadline is met.
+
+    Merging starts as soon as ``VISION_ENSEMBLE_QUORUM`` experts have answered, or
+    once ``VISION_ENSEMBLE_DEADLINE_SECONDS`` has passed with at least one answer;
+    remaining experts are cancelled. Responses keep the configured model order.
+    Experts with an open circuit, or whose median latency is past the deadline
+    while enough faster experts remain, are not asked. ``consulted`` lists
+    experts that already answered in an earlier round.
+
+    Under a request deadline the merge deadline also leaves ``VERIFIER_MIN_SECONDS``
+    for the verifier, and ``DeadlineExceeded`` is raised if no expert answers
+    before the request budget runs out.
+    """
+    deadline = settings.VISION_ENSEMBLE_DEADLINE_SECONDS
+    remaining = remaining_seconds()
+    if remaining is not None:
+        expert_budget = remaining - settings.VERIFIER_MIN_SECONDS
+        if expert_budget <= 0:
+            expert_budget = remaining
+        deadline = min(deadline, expert_budget) if deadline > 0 else expert_budget
+    routed = _route_models(
+        VISION_ENSEMBLE_MODEL_IDS,
+        _get_vision_models(),
+        max_latency=deadline if deadline > 0 else None,
+        keep=max(settings.VISION_ENSEMBLE_QUORUM, 1),
+    )
+    tasks = {
+        asyncio.create_task(
+            _consult_vision_expert(model, prompt, image, model_id, schema=schema)
+        ): model_id
+        for model_id, model in routed
+        if model_id not in consulted
+    }
+    if not tasks:
+        return []
+    quorum = settings.VISION_ENSEMBLE_QUORUM or len(tasks)
+    quorum = min(quorum, len(tasks))
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + deadline if deadline > 0 else None
+    request_deadline_at = loop.time() + remaining if remaining is not None else None
+
+    answered: dict[str, ExpertAnswer] = {}
+    failed: list[str] = []
+    pending = set(tasks)
+    # Experts still running when the request deadline cuts them off timed out;
+    # any others are stragglers we no longer need.
+    timed_out = False
+    try:
+        while pending and len(answered) < quorum:
+            timeout = None
+            if deadline_at is not None:
+                timeout = deadline_at - loop.time()
+                if timeout <= 0:
+                    if answered:
+                        break
+                    # Past the deadline with nothing usable: take the first answer that arrives.
+                    timeout = None
+            if timeout is None and request_deadline_at is not None:
+                timeout = request_deadline_at - loop.time()
+                if timeout <= 0:
+                    timed_out = True
+                    raise DeadlineExceeded("vision_experts")
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                answer = task.result()
+                if answer.text.strip():
+                    answered[tasks[task]] = answer
+                else:
+                    failed.append(tasks[task])
+    finally:
+        for task in pending:
+            if timed_out:
+                task.cancel()
+            else:
+                abandon_model_call(task)
+
+    _record_experts(
+        contributed=[model_id for model_id in VISION_ENSEMBLE_MODEL_IDS if model_id in answered],
+        failed=failed,
+        cancelled=[tasks[task] for task in pending],
+    )
+    return [answered[model_id] for model_id in VISION_ENSEMBLE_MODEL_IDS if model_id in answered]
 
 
 def _build_merge_prompt(user_prompt: str, responses: list[str]) -> str:
@@ -175,47 +393,474 @@ def _build_merge_prompt(user_prompt: str, responses: list[str]) -> str:
     )
 
 
-def _merge_with_final_model(
+async def _stream_structured(
+    model: ChatOpenAI,
+    schema: Type[StructuredModel],
+    prompt: str,
+    model_id: str,
+) -> tuple[Optional[StructuredModel], str, Optional[Exception]]:
+    """Stream a structured answer, emitting each top-level field once it is complete.
+
+    Returns ``(parsed, raw_text, error)`` like ``_invoke_text_structured``; a
+    length-truncated stream is completed through the JSON salvage path.
+    """
+    chunks: list[str] = []
+    emitted: set[str] = set()
+    try:
+        async with model_call(model_id):
+            async for chunk in model.astream(prompt, response_format=schema):
+                text = chunk.content if isinstance(chunk.content, str) else ""
+                if not text:
+                    continue
+                chunks.append(text)
+                # A field can only have just completed when its trailing "," or "}" arrives.
+                if "," not in text and "}" not in text:
+                    continue
+                for name, value in salvage_partial_json("".join(chunks)).items():
+                    if name not in emitted:
+                        emitted.add(name)
+                        emit_event("field", model=model_id, name=name, value=value)
+    except Exception as exc:
+        raw_text = "".join(chunks)
+        partial_text = find_truncated_content(exc)
+        if partial_text is None:
+            return None, raw_text, exc
+        salvaged = await complete_truncated_output(model, schema, prompt, partial_text)
+        if salvaged is None:
+            return None, raw_text, exc
+        return salvaged, salvaged.model_dump_json(), None
+
+    raw_text = "".join(chunks)
+    try:
+        return schema.model_validate_json(raw_text), raw_text, None
+    except ValueError as exc:
+        return None, raw_text, exc
+
+
+async def _invoke_structured_or_salvage(
+    model: ChatOpenAI,
+    schema: Type[StructuredModel],
+    prompt: str,
+    model_id: str,
+) -> Optional[StructuredModel]:
+    """Structured call that completes a length-truncated answer instead of discarding it."""
+    try:
+        async with model_call(model_id):
+            return await get_structured_runnable(model, schema).ainvoke(prompt)
+    except Exception as exc:
+        partial_text = find_truncated_content(exc)
+        if not partial_text:
+            raise
+        salvaged = await complete_truncated_output(model, schema, prompt, partial_text)
+        if salvaged is None:
+            raise
+        return salvaged
+
+
+class VerifierError(RuntimeError):
+    """The final verifier failed after the experts had already answered.
+
+    Carries the expert responses so a retry can re-run only the verifier. The
+    message is the underlying error's, so truncation/parse detection still works.
+    """
+
+    def __init__(
+        self,
+        cause: Exception,
+        expert_responses: list[str],
+        problems: Optional[list[str]] = None,
+    ) -> None:
+        super().__init__(str(cause))
+        self.expert_responses = expert_responses
+        self.problems = problems or []
+
+
+async def _merge_with_final_model(
     user_prompt: str,
     responses: list[str],
     schema: Optional[Type[StructuredModel]] = None,
+    problems: Optional[list[str]] = None,
 ) -> Any:
     if not responses:
         raise RuntimeError("All ensemble models failed to respond.")
 
-    merge_prompt = _build_merge_prompt(user_prompt, responses)
+    if problems:
+        merge_prompt = _build_repair_prompt(user_prompt, responses, problems)
+    else:
+        merge_prompt = _build_merge_prompt(user_prompt, responses)
     verifier = _get_final_verifier_model()
+    emit_event("verifier", model=FINAL_VERIFIER_MODEL_ID, status="started", responses=len(responses))
+
+    try:
+        async with deadline_scope("verifier"):
+            if schema is None:
+                async with model_call(FINAL_VERIFIER_MODEL_ID):
+                    return await verifier.ainvoke(merge_prompt)
+
+            trace = current_trace()
+            if trace is not None and trace.streaming:
+                response, _, error = await _stream_structured(
+                    verifier, schema, merge_prompt, FINAL_VERIFIER_MODEL_ID
+                )
+                if response is None:
+                    raise error or RuntimeError("Verifier returned NoneType structured response")
+                return response
+
+            response = await _invoke_structured_or_salvage(
+                verifier, schema, merge_prompt, FINAL_VERIFIER_MODEL_ID
+            )
+            if response is None:
+                raise RuntimeError("Verifier returned NoneType structured response")
+            return response
+    except DeadlineExceeded:
+        raise
+    except Exception as exc:
+        raise VerifierError(exc, responses, problems) from exc
+
+
+async def retry_verifier(
+    user_prompt: str,
+    error: VerifierError,
+    schema: Optional[Type[StructuredModel]] = None,
+) -> Any:
+    """Re-run only the verifier on the experts' earlier answers, e.g. with a tighter prompt."""
+    trace = current_trace()
+    if trace is not None:
+        trace.details["verifier_retry"] = True
+    return await _merge_with_final_model(
+        user_prompt,
+        error.expert_responses,
+        schema=schema,
+        problems=error.problems,
+    )
+
+
+async def _invoke_text_structured(
+    model: ChatOpenAI,
+    prompt: str,
+    model_id: str,
+    schema: Type[StructuredModel],
+) -> tuple[Optional[StructuredModel], str, Optional[Exception]]:
+    """Ask a text model for the target schema directly.
+
+    Returns ``(parsed, raw_text, error)``; ``raw_text`` is kept so a response that
+    fails validation can still be handed to the verifier.
+    """
+    trace = current_trace()
+    if trace is not None and trace.streaming:
+        try:
+            parsed, raw_text, error = await _stream_structured(model, schema, prompt, model_id)
+        except Exception as exc:
+            parsed, raw_text, error = None, "", exc
+        if parsed is None and not raw_text:
+            logger.warning("Text model '%s' failed: %s", model_id, error)
+        return parsed, raw_text, error
+
+    try:
+        async with model_call(model_id):
+            output = await get_structured_runnable(model, schema, include_raw=True).ainvoke(prompt)
+    except Exception as exc:
+        partial_text = find_truncated_content(exc)
+        if partial_text:
+            try:
+                salvaged = await complete_truncated_output(model, schema, prompt, partial_text)
+            except Exception as salvage_exc:
+                logger.warning("Text model '%s' salvage failed: %s", model_id, salvage_exc)
+                salvaged = None
+            if salvaged is not None:
+                return salvaged, salvaged.model_dump_json(), None
+            return None, partial_text, exc
+        logger.warning("Text model '%s' failed: %s", model_id, exc)
+        return None, "", exc
+    raw_text = _extract_response_text(output.get("raw"))
+    return output.get("parsed"), raw_text, output.get("parsing_error")
+
+
+def _build_repair_prompt(user_prompt: str, responses: list[str], problems: list[str]) -> str:
+    issues = "\n".join(f"- {problem}" for problem in problems)
+    return (
+        f"{_build_merge_prompt(user_prompt, responses)}\n\n"
+        f"The expert responses have these problems that must be fixed:\n{issues}"
+    )
 
-    if schema is None:
-        return verifier.invoke(merge_prompt)
 
-    verifier_with_schema = verifier.with_structured_output(schema)
-    return verifier_with_schema.invoke(merge_prompt)
+TEXT_PATH_COUNTS: Counter[str] = Counter()
+VISION_MERGE_COUNTS: Counter[str] = Counter()
 
 
-def ensemble_invoke_text(
+def _path_stats(counts: Counter[str], local_paths: tuple[str, ...]) -> dict[str, Any]:
+    total = sum(counts.values())
+    skipped = sum(counts[path] for path in local_paths)
+    return {
+        "total": total,
+        "skipped_verifier": {path: counts[path] for path in local_paths},
+        "skipped_verifier_rate": round(skipped / total, 4) if total else 0.0,
+        "verifier": {reason: count for reason, count in counts.items() if reason not in local_paths},
+    }
+
+
+def text_path_stats() -> dict[str, Any]:
+    """How often the text path returned the primary answer without the verifier."""
+    return _path_stats(TEXT_PATH_COUNTS, ("fast_path", "deadline_unverified", "lite"))
+
+
+def vision_merge_stats() -> dict[str, Any]:
+    """How often vision answers were used without the verifier."""
+    return _path_stats(
+        VISION_MERGE_COUNTS,
+        ("consensus", "single_expert", "deadline_unverified", "lite"),
+    )
+
+
+def _record_path(
+    counts: Counter[str],
+    detail_key: str,
+    path: str,
+    problems: Optional[list[str]] = None,
+) -> None:
+    counts[path] += 1
+    trace = current_trace()
+    if trace is not None:
+        trace.details[detail_key] = path
+        if problems:
+            trace.details[f"{detail_key}_problems"] = problems
+
+
+async def _run_lite_text(prompt: str, schema: Optional[Type[StructuredModel]]) -> Any:
+    """Lite mode: the first text model that answers, without quality checks or the verifier."""
+    if schema is None:
+        response = await _run_text_with_fallback(prompt)
+        if not response:
+            raise RuntimeError("All text models failed to respond.")
+        return response
+    for model_id, model in _route_models(TEXT_ENSEMBLE_MODEL_IDS, _get_text_models()):
+        async with deadline_scope("text_model"):
+            parsed, _, _ = await _invoke_text_structured(model, prompt, model_id, schema)
+        if parsed is not None:
+            _record_path(TEXT_PATH_COUNTS, "text_path", "lite")
+            return parsed
+    raise RuntimeError("All text models failed to respond.")
+
+
+async def ensemble_invoke_text(
     prompt: str,
     schema: Optional[Type[StructuredModel]] = None,
+    quality_check: Optional[Callable[[StructuredModel], list[str]]] = None,
 ) -> Any:
-    """Run one lightweight text model, fallback if needed, then verify with the final model."""
-    response = _run_text_with_fallback(prompt)
-    if not response:
-        raise RuntimeError("All text models failed to respond.")
+    """Run one lightweight text model with fallback, using the verifier only when needed.
+
+    With a schema the primary model answers in that schema directly. The answer
+    is returned as-is when it validates and ``quality_check`` finds no problems;
+    otherwise the final verifier repairs it, unless the request deadline leaves
+    less than ``VERIFIER_MIN_SECONDS``. In lite mode the first valid answer is
+    returned without checks.
+    """
+    if lite_mode_active():
+        return await _run_lite_text(prompt, schema)
 
-    merge_prompt = _build_merge_prompt(prompt, [response])
-    verifier = _get_final_verifier_model()
     if schema is None:
-        return verifier.invoke(merge_prompt)
+        response = await _run_text_with_fallback(prompt)
+        if not response:
+            raise RuntimeError("All text models failed to respond.")
+        return await _merge_with_final_model(prompt, [response])
+
+    raw_response = ""
+    parsed = None
+    problems: list[str] = []
+    for model_id, model in _route_models(TEXT_ENSEMBLE_MODEL_IDS, _get_text_models()):
+        async with deadline_scope("text_model"):
+            parsed, raw_text, error = await _invoke_text_structured(model, prompt, model_id, schema)
+        if parsed is not None:
+            problems = quality_check(parsed) if quality_check else []
+            if not problems:
+                _record_path(TEXT_PATH_COUNTS, "text_path", "fast_path")
+                return parsed
+            raw_response = raw_text or parsed.model_dump_json()
+            break
+        if raw_text:
+            # The model answered but the output did not validate against the schema.
+            raw_response = raw_text
+            problems = [f"schema validation failed: {error}"]
+            break
+
+    if not raw_response:
+        _record_path(TEXT_PATH_COUNTS, "text_path", "verifier_no_primary")
+        raise RuntimeError("All text models failed to respond.")
+
+    if parsed is not None and not has_time_for(settings.VERIFIER_MIN_SECONDS):
+        # Too little of the request budget is left for a repair pass.
+        _record_path(TEXT_PATH_COUNTS, "text_path", "deadline_unverified", problems)
+        return parsed
+
+    _record_path(
+        TEXT_PATH_COUNTS,
+        "text_path",
+        "verifier_quality" if parsed is not None else "verifier_schema",
+        problems,
+    )
+    return await _merge_with_final_model(prompt, [raw_response], schema=schema, problems=problems)
+
 
-    verifier_with_schema = verifier.with_structured_output(schema)
-    return verifier_with_schema.invoke(merge_prompt)
+def _accept_single_expert(response: ImageAnalysisLLMResponse) -> bool:
+    """Progressive policy: whether the first expert's answer can stand alone."""
+    if response.health_status == "Severe" and settings.VISION_PROGRESSIVE_ESCALATE_SEVERE:
+        return False
+    return response.confidence in settings.VISION_PROGRESSIVE_ACCEPT_CONFIDENCE
 
 
-def ensemble_invoke_vision(
-    image_base64: str,
+async def _run_progressive_vision(
+    prompt: str,
+    image: VisionPayload,
+    quality_check: Optional[Callable[[ImageAnalysisLLMResponse], list[str]]] = None,
+) -> tuple[Optional[ImageAnalysisLLMResponse], list[ExpertAnswer]]:
+    """Ask the fastest healthy expert alone; returns its answer when it needs no escalation.
+
+    Otherwise returns the answers gathered so far, including the remaining experts.
+    """
+    routed = _route_models(VISION_ENSEMBLE_MODEL_IDS, _get_vision_models())
+    if not routed:
+        return None, []
+    first_id, first_model = routed[0]
+    async with deadline_scope("vision_expert"):
+        first = await _consult_vision_expert(
+            first_model,
+            prompt,
+            image,
+            first_id,
+            schema=ImageAnalysisLLMResponse,
+        )
+    if first.text.strip():
+        _record_experts(contributed=[first.model_id], failed=[], cancelled=[])
+    else:
+        _record_experts(contributed=[], failed=[first.model_id], cancelled=[])
+
+    if first.parsed is not None and _accept_single_expert(first.parsed):
+        problems = quality_check(first.parsed) if quality_check else []
+        if not problems:
+            return first.parsed, [first]
+
+    if first.parsed is not None and not has_time_for(settings.VERIFIER_MIN_SECONDS):
+        # No budget left to escalate; the caller uses this answer unverified.
+        return None, [first]
+
+    others = await _run_parallel_vision(
+        prompt,
+        image,
+        schema=ImageAnalysisLLMResponse,
+        consulted=(first_id,),
+    )
+    answers = [first, *others] if first.text.strip() else others
+    return None, answers
+
+
+def _most_confident_answer(answers: list[ExpertAnswer]) -> Optional[ImageAnalysisLLMResponse]:
+    parsed = [answer.parsed for answer in answers if answer.parsed is not None]
+    if not parsed:
+        return None
+    return max(parsed, key=lambda response: CONFIDENCE_RANK.get(response.confidence, 0))
+
+
+async def _verify_vision_answers(
+    prompt: str,
+    answers: list[ExpertAnswer],
+    schema: Optional[Type[StructuredModel]],
+    reason: Optional[str],
+    problems: Optional[list[str]] = None,
+) -> Any:
+    """Hand expert answers to the verifier, or use the most confident one when out of budget."""
+    if schema is ImageAnalysisLLMResponse and not has_time_for(settings.VERIFIER_MIN_SECONDS):
+        best = _most_confident_answer(answers)
+        if best is not None:
+            _record_path(VISION_MERGE_COUNTS, "vision_merge", "deadline_unverified", problems)
+            return best
+    if reason is not None:
+        _record_path(VISION_MERGE_COUNTS, "vision_merge", reason, problems)
+    return await _merge_with_final_model(
+        prompt,
+        [answer.text for answer in answers],
+        schema=schema,
+        problems=problems,
+    )
+
+
+async def _run_lite_vision(
+    prompt: str,
+    image: VisionPayload,
+    schema: Optional[Type[StructuredModel]],
+) -> Any:
+    """Lite mode: the fastest healthy expert's answer, falling back to the next one if it fails."""
+    for model_id, model in _route_models(VISION_ENSEMBLE_MODEL_IDS, _get_vision_models()):
+        async with deadline_scope("vision_expert"):
+            answer = await _consult_vision_expert(model, prompt, image, model_id, schema=schema)
+        usable = answer.parsed is not None if schema is not None else bool(answer.text.strip())
+        if usable:
+            _record_experts(contributed=[model_id], failed=[], cancelled=[])
+            _record_path(VISION_MERGE_COUNTS, "vision_merge", "lite")
+            return answer.parsed if schema is not None else answer.text
+        _record_experts(contributed=[], failed=[model_id], cancelled=[])
+    raise RuntimeError("All vision models failed to respond.")
+
+
+async def ensemble_invoke_vision(
+    image_base64: str | VisionPayload,
     prompt: str,
     schema: Optional[Type[StructuredModel]] = None,
+    quality_check: Optional[Callable[[StructuredModel], list[str]]] = None,
 ) -> Any:
-    """Run vision models in parallel, then merge and verify with the final model."""
-    responses = _run_parallel_vision(prompt, image_base64)
-    return _merge_with_final_model(prompt, responses, schema=schema)
+    """Run vision models, then merge locally or with the final verifier.
+
+    Structured image analyses that agree on health status and primary issue are
+    merged without the verifier; disagreements and failed checks go to the verifier.
+    With ``VISION_ENSEMBLE_POLICY="progressive"`` a confident first expert is used
+    alone and the other experts plus the verifier only run when it is unsure.
+    When the request deadline leaves less than ``VERIFIER_MIN_SECONDS``, the most
+    confident expert answer is returned instead of calling the verifier. In lite
+    mode only the fastest healthy expert is asked.
+
+    ``image_base64`` is either one JPEG for every expert or a ``VisionPayload``
+    with an encoding per model target.
+    """
+    image = (
+        image_base64 if isinstance(image_base64, VisionPayload) else VisionPayload.from_base64(image_base64)
+    )
+    if lite_mode_active():
+        return await _run_lite_vision(prompt, image, schema)
+
+    progressive = (
+        settings.VISION_ENSEMBLE_POLICY == "progressive"
+        and schema is ImageAnalysisLLMResponse
+        and len(VISION_ENSEMBLE_MODEL_IDS) > 1
+    )
+    trace = current_trace()
+    if trace is not None and schema is ImageAnalysisLLMResponse:
+        trace.details["vision_policy"] = settings.VISION_ENSEMBLE_POLICY
+
+    if progressive:
+        accepted, answers = await _run_progressive_vision(prompt, image, quality_check)
+        if accepted is not None:
+            _record_path(VISION_MERGE_COUNTS, "vision_merge", "single_expert")
+            return accepted
+        return await _verify_vision_answers(prompt, answers, schema, "verifier_escalated")
+
+    answers = await _run_parallel_vision(prompt, image, schema=schema)
+
+    reason: Optional[str] = None
+    problems: list[str] = []
+    if schema is ImageAnalysisLLMResponse and answers:
+        parsed = [answer.parsed for answer in answers if answer.parsed is not None]
+        if len(parsed) < len(answers):
+            reason = "verifier_schema"
+        elif len(parsed) < settings.VISION_CONSENSUS_MIN_EXPERTS:
+            reason = "verifier_too_few_experts"
+        else:
+            merged = consensus_merge(parsed, min_experts=settings.VISION_CONSENSUS_MIN_EXPERTS)
+            if merged is None:
+                reason = "verifier_disagreement"
+            else:
+                problems = quality_check(merged) if quality_check else []
+                if not problems:
+                    _record_path(VISION_MERGE_COUNTS, "vision_merge", "consensus")
+                    return merged
+                reason = "verifier_quality"
+
+    return await _verify_vision_answers(prompt, answers, schema, reason, problems)
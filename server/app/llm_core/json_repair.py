@@ -0,0 +1,174 @@
+"""Salvage truncated structured outputs instead of regenerating them.
+
+Long Hindi, Assamese and Bodo answers often hit the max-token limit part-way
+through the JSON object. The OpenAI client then raises
+``LengthFinishReasonError`` carrying the partial completion. Every field that
+was fully written is recovered from it, the model is asked for only the missing
+fields (via a schema subset), and the two halves are stitched back into the
+full response model.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Optional, Type, TypeVar
+
+from langchain_openai import ChatOpenAI
+from openai import LengthFinishReasonError
+from pydantic import BaseModel, create_model
+
+from app.core.tracing import current_trace
+from app.llm_core.openrouter_model import get_structured_runnable
+
+logger = logging.getLogger(__name__)
+
+StructuredModel = TypeVar("StructuredModel", bound=BaseModel)
+
+_decoder = json.JSONDecoder()
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return index
+
+
+def salvage_partial_json(text: str) -> dict[str, Any]:
+    """Return every complete top-level field of a possibly truncated JSON object.
+
+    Parsing stops at the first field whose value is cut off; values that cannot
+    be confirmed complete (a trailing number or literal) are dropped too.
+    """
+    start = text.find("{")
+    if start < 0:
+        return {}
+
+    salvaged: dict[str, Any] = {}
+    index = start + 1
+    while True:
+        index = _skip_whitespace(text, index)
+        if index >= len(text) or text[index] != '"':
+            break
+        try:
+            key, index = _decoder.raw_decode(text, index)
+        except ValueError:
+            break
+
+        index = _skip_whitespace(text, index)
+        if index >= len(text) or text[index] != ":":
+            break
+        index = _skip_whitespace(text, index + 1)
+        try:
+            value, end = _decoder.raw_decode(text, index)
+        except ValueError:
+            break
+
+        index = _skip_whitespace(text, end)
+        if index >= len(text):
+            # Strings, objects and arrays are closed; bare numbers may be cut off.
+            if isinstance(value, (str, dict, list)):
+                salvaged[key] = value
+            break
+        if text[index] not in ",}":
+            break
+        salvaged[key] = value
+        if text[index] == "}":
+            break
+        index += 1
+    return salvaged
+
+
+def find_truncated_content(exc: BaseException) -> Optional[str]:
+    """Partial completion text from a length-limited response anywhere in the cause chain."""
+    seen: set[int] = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, LengthFinishReasonError):
+            choices = getattr(current.completion, "choices", None) or []
+            if choices and choices[0].message is not None:
+                return choices[0].message.content or None
+            return None
+        current = current.__cause__ or current.__context__
+    return None
+
+
+@lru_cache(maxsize=64)
+def missing_fields_model(
+    schema: Type[BaseModel],
+    field_names: tuple[str, ...],
+) -> Type[BaseModel]:
+    """Schema subset containing only ``field_names``, reused across requests."""
+    fields = {
+        name: (schema.model_fields[name].annotation, schema.model_fields[name])
+        for name in field_names
+    }
+    return create_model(f"{schema.__name__}Missing", __doc__=schema.__doc__, **fields)
+
+
+def _valid_fields(schema: Type[BaseModel], salvaged: dict[str, Any]) -> dict[str, Any]:
+    """Keep salvaged fields that individually validate against the schema."""
+    valid: dict[str, Any] = {}
+    for name, value in salvaged.items():
+        if name not in schema.model_fields:
+            continue
+        try:
+            missing_fields_model(schema, (name,)).model_validate({name: value})
+        except ValueError:
+            continue
+        valid[name] = value
+    return valid
+
+
+def _continuation_prompt(prompt: str, written: dict[str, Any], missing: tuple[str, ...]) -> str:
+    return (
+        f"{prompt}\n\n"
+        "Your previous answer was cut off by the output length limit. "
+        "These fields are already complete and must not be repeated:\n"
+        f"{json.dumps(written, ensure_ascii=False)}\n\n"
+        f"Write ONLY the remaining fields: {', '.join(missing)}. "
+        "Keep them consistent with the completed fields, in the same language, and concise."
+    )
+
+
+async def complete_truncated_output(
+    model: ChatOpenAI,
+    schema: Type[StructuredModel],
+    prompt: str,
+    partial_text: str,
+) -> Optional[StructuredModel]:
+    """Stitch salvaged fields and a missing-fields continuation into ``schema``.
+
+    Returns None when nothing useful could be salvaged, so callers fall back to
+    their normal retry.
+    """
+    written = _valid_fields(schema, salvage_partial_json(partial_text))
+    if not written:
+        return None
+
+    missing = tuple(name for name in schema.model_fields if name not in written)
+    trace = current_trace()
+    if trace is not None:
+        trace.details["json_salvage"] = {"salvaged": list(written), "completed": list(missing)}
+
+    if not missing:
+        return schema.model_validate(written)
+
+    from app.llm_core.model_health import model_call
+
+    subset = missing_fields_model(schema, missing)
+    async with model_call(model.model_name):
+        continuation = await get_structured_runnable(model, subset).ainvoke(
+            _continuation_prompt(prompt, written, missing)
+        )
+    if continuation is None:
+        return None
+    logger.info(
+        "Salvaged %s truncated fields of %s; regenerated %s",
+        len(written),
+        schema.__name__,
+        ", ".join(missing),
+    )
+    return schema.model_validate({**written, **continuation.model_dump()})
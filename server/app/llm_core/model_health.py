@@ -0,0 +1,259 @@
+"""Per-model health tracking, circuit breaking and latency-aware routing.
+
+Every OpenRouter call goes through ``model_call`` (a scheduler slot around
+``track_model_call``) so each model ID from
+the text, vision and verifier pools gets rolling latency percentiles and an
+error rate. After ``MODEL_CIRCUIT_FAILURE_THRESHOLD`` consecutive failures the
+model's circuit opens and calls to it fail immediately instead of adding a full
+timeout to every request. Once ``MODEL_CIRCUIT_COOLDOWN_SECONDS`` has passed a
+single probe call is let through (half-open); its outcome closes the circuit or
+opens it again.
+
+``route`` orders a model pool by observed median latency and drops models whose
+circuit is open, so fallbacks and expert fan-out prefer fast, healthy models.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from app.core.config import settings
+from app.core.deadline import remaining_seconds
+from app.llm_core.json_repair import find_truncated_content
+from app.llm_core.scheduler import get_llm_scheduler
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The model's circuit is open, so the call was not attempted."""
+
+    def __init__(self, model_id: str) -> None:
+        super().__init__(f"circuit open for model '{model_id}'")
+        self.model_id = model_id
+
+
+class ModelHealth:
+    """Rolling latency/outcome window and circuit state for one model."""
+
+    def __init__(self, model_id: str, window: int) -> None:
+        self.model_id = model_id
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.last_error: Optional[str] = None
+
+    def _cooldown_elapsed(self, now: float) -> bool:
+        return now - self.opened_at >= settings.MODEL_CIRCUIT_COOLDOWN_SECONDS
+
+    def _probe_outstanding(self, now: float) -> bool:
+        # A probe that never reported back (e.g. its request was dropped) expires after a cooldown.
+        return (
+            self.probe_started_at is not None
+            and now - self.probe_started_at < settings.MODEL_CIRCUIT_COOLDOWN_SECONDS
+        )
+
+    def available(self, now: Optional[float] = None) -> bool:
+        """Whether a call would currently be attempted; has no side effects."""
+        now = time.monotonic() if now is None else now
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self._cooldown_elapsed(now)
+        return not self._probe_outstanding(now)
+
+    def try_acquire(self) -> bool:
+        """Admit a call, moving an open circuit to half-open for a single probe."""
+        now = time.monotonic()
+        if not self.available(now):
+            self.short_circuited += 1
+            return False
+        if self.state != CLOSED:
+            self.state = HALF_OPEN
+            self.probe_started_at = now
+        return True
+
+    def release(self) -> None:
+        """The admitted call was cancelled before it produced an outcome."""
+        self.probe_started_at = None
+
+    def record_success(self, latency: float) -> None:
+        self.calls += 1
+        self._latencies.append(latency)
+        self._outcomes.append(True)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.probe_started_at = None
+
+    def record_failure(self, latency: float, error: BaseException) -> None:
+        self.calls += 1
+        self.failures += 1
+        self._latencies.append(latency)
+        self._outcomes.append(False)
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"[:300]
+        self.probe_started_at = None
+        if self.state == HALF_OPEN or self.consecutive_failures >= settings.MODEL_CIRCUIT_FAILURE_THRESHOLD:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def median_latency(self) -> Optional[float]:
+        """Median latency once enough samples exist to route on it."""
+        if len(self._latencies) < settings.MODEL_HEALTH_MIN_SAMPLES:
+            return None
+        return self.latency_percentile(50)
+
+    def error_rate(self) -> Optional[float]:
+        if not self._outcomes:
+            return None
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def stats(self) -> dict[str, Any]:
+        def rounded_ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        error_rate = self.error_rate()
+        return {
+            "state": self.state,
+            "available": self.available(),
+            "calls": self.calls,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "consecutive_failures": self.consecutive_failures,
+            "window_samples": len(self._latencies),
+            "error_rate": round(error_rate, 4) if error_rate is not None else None,
+            "latency_ms": {
+                "p50": rounded_ms(self.latency_percentile(50)),
+                "p90": rounded_ms(self.latency_percentile(90)),
+                "p99": rounded_ms(self.latency_percentile(99)),
+            },
+            "last_error": self.last_error,
+        }
+
+
+class ModelHealthRegistry:
+    """Health entries keyed by OpenRouter model ID."""
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self._models: dict[str, ModelHealth] = {}
+
+    def get(self, model_id: str) -> ModelHealth:
+        health = self._models.get(model_id)
+        if health is None:
+            health = self._models[model_id] = ModelHealth(model_id, self.window)
+        return health
+
+    def route(
+        self,
+        model_ids: Sequence[str],
+        max_latency: Optional[float] = None,
+        keep: int = 1,
+    ) -> list[str]:
+        """Available models, fastest observed median first.
+
+        Models without enough samples keep their configured position ahead of
+        measured ones so they get sampled. With ``max_latency``, models whose
+        median exceeds it are dropped as long as ``keep`` models remain.
+        """
+        now = time.monotonic()
+        available = [model_id for model_id in model_ids if self.get(model_id).available(now)]
+        medians = {model_id: self.get(model_id).median_latency() for model_id in available}
+        ordered = sorted(available, key=lambda model_id: medians[model_id] or 0.0)
+        if max_latency is None:
+            return ordered
+        # Unmeasured and fast models sort first, so the fast ones are a prefix.
+        fast = sum(1 for model_id in ordered if (medians[model_id] or 0.0) <= max_latency)
+        return ordered[: max(keep, fast)]
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {model_id: health.stats() for model_id, health in self._models.items()}
+
+
+@lru_cache(maxsize=1)
+def get_model_health() -> ModelHealthRegistry:
+    return ModelHealthRegistry(window=settings.MODEL_HEALTH_WINDOW)
+
+
+# Tasks cancelled on purpose (e.g. vision stragglers once the quorum answered).
+_abandoned_calls: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+
+
+def abandon_model_call(task: asyncio.Task) -> None:
+    """Cancel a task whose model call is no longer needed, without counting it against the model."""
+    _abandoned_calls.add(task)
+    task.cancel()
+
+
+def _cut_off_by_deadline() -> bool:
+    """Whether the current task was cancelled because its request deadline ran out."""
+    if asyncio.current_task() in _abandoned_calls:
+        return False
+    remaining = remaining_seconds()
+    return remaining is not None and remaining <= 0
+
+
+@contextmanager
+def track_model_call(model_id: str) -> Iterator[None]:
+    """Time one model call and record its outcome; raises ``CircuitOpenError`` when skipped.
+
+    Length-truncated answers count as successes because the model did respond.
+    A call cancelled because the request deadline ran out is a timeout failure;
+    other cancellations (an abandoned straggler, a client that went away)
+    record nothing.
+    """
+    health = get_model_health().get(model_id)
+    if not health.try_acquire():
+        raise CircuitOpenError(model_id)
+    started = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        if _cut_off_by_deadline():
+            health.record_failure(
+                time.perf_counter() - started,
+                TimeoutError("request deadline reached before the model answered"),
+            )
+        else:
+            health.release()
+        raise
+    except Exception as exc:
+        if find_truncated_content(exc) is not None:
+            health.record_success(time.perf_counter() - started)
+        else:
+            health.record_failure(time.perf_counter() - started, exc)
+        raise
+    else:
+        health.record_success(time.perf_counter() - started)
+
+
+@asynccontextmanager
+async def model_call(model_id: str) -> AsyncIterator[None]:
+    """Queue for a scheduler slot, then time the call against the model's health."""
+    if not get_model_health().get(model_id).available():
+        # Fail fast instead of queueing for a model whose circuit is open.
+        raise CircuitOpenError(model_id)
+    async with get_llm_scheduler().slot(model_id):
+        with track_model_call(model_id):
+            yield
@@ -1,12 +1,23 @@
-"""OpenRouter helpers — embeddings only.
+"""OpenRouter connection helpers shared by the ensemble and embeddings.
 
 Text and vision inference are handled by the ensemble pipeline in ensemble.py.
+Every OpenRouter client (chat models and embeddings) shares one pooled
+keep-alive HTTP client per sync/async flavour, sized from settings and using
+HTTP/2 when the ``h2`` package is installed, so requests to different models
+reuse the same connections to openrouter.ai.
 """
 
+import importlib.util
+import logging
 from functools import lru_cache
+from typing import Any, Optional, Type
+
+import httpx
+from pydantic import BaseModel
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
 
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_DEFAULT_HEADERS = {
@@ -14,6 +25,81 @@ OPENROUTER_DEFAULT_HEADERS = {
     "X-Title": "Leaf Disease Detection",
 }
 
+_async_http_client: Optional[httpx.AsyncClient] = None
+_sync_http_client: Optional[httpx.Client] = None
+_structured_runnables: dict[tuple[int, Type[BaseModel], bool], tuple[Any, Any]] = {}
+
+
+def _http2_enabled() -> bool:
+    return settings.OPENROUTER_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _http_client_options() -> dict[str, Any]:
+    http2 = _http2_enabled()
+    if settings.OPENROUTER_HTTP2 and not http2:
+        logger.info("h2 is not installed; OpenRouter connections use HTTP/1.1 keep-alive")
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENROUTER_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "timeout": httpx.Timeout(settings.OPENROUTER_TIMEOUT_SECONDS, connect=10.0),
+    }
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pooled async HTTP client shared by every OpenRouter model."""
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(**_http_client_options())
+    return _async_http_client
+
+
+def get_sync_http_client() -> httpx.Client:
+    """Pooled sync HTTP client for the blocking LangChain code paths."""
+    global _sync_http_client
+    if _sync_http_client is None or _sync_http_client.is_closed:
+        _sync_http_client = httpx.Client(**_http_client_options())
+    return _sync_http_client
+
+
+def openrouter_client_options() -> dict[str, Any]:
+    """Connection options shared by every LangChain OpenAI client pointed at OpenRouter."""
+    return {
+        "base_url": OPENROUTER_BASE_URL,
+        "default_headers": OPENROUTER_DEFAULT_HEADERS,
+        "timeout": settings.OPENROUTER_TIMEOUT_SECONDS,
+        "http_client": get_sync_http_client(),
+        "http_async_client": get_async_http_client(),
+    }
+
+
+def get_structured_runnable(model: Any, schema: Type[BaseModel], include_raw: bool = False) -> Any:
+    """``model.with_structured_output(schema)``, built once per model and schema."""
+    key = (id(model), schema, include_raw)
+    cached = _structured_runnables.get(key)
+    if cached is None:
+        # Keep the model referenced so its id cannot be reused by another object.
+        cached = _structured_runnables[key] = (
+            model,
+            model.with_structured_output(schema, include_raw=include_raw),
+        )
+    return cached[1]
+
+
+async def close_http_clients() -> None:
+    """Close the shared pools and drop everything built on top of them."""
+    global _async_http_client, _sync_http_client
+    _structured_runnables.clear()
+    get_openrouter_embedding_model.cache_clear()
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _sync_http_client is not None:
+        _sync_http_client.close()
+        _sync_http_client = None
 
 
 @lru_cache(maxsize=1)
@@ -28,7 +114,6 @@ def get_openrouter_embedding_model():
 
     return OpenAIEmbeddings(
         model=embedding_model,
-        base_url=OPENROUTER_BASE_URL,
         api_key=settings.OPENROUTER_API_KEY,
-        default_headers=OPENROUTER_DEFAULT_HEADERS,
+        **openrouter_client_options(),
     )
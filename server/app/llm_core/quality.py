@@ -0,0 +1,112 @@
+"""Cheap local quality checks for structured LLM responses.
+
+A response that validates against its schema can still be unusable: empty
+narrative fields, a detailed report missing its sections, or text written in
+the wrong script. These checks decide whether a primary-model answer can be
+returned as-is or needs another pass through the verifier model.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from app.models.analysis import PlantCareLLMResponse, SymptomsAnalysisLLMResponse
+
+# Unicode ranges for the script each response language must use.
+LANGUAGE_SCRIPT_RANGES: dict[str, tuple[tuple[int, int], ...]] = {
+    "en": ((0x0041, 0x005A), (0x0061, 0x007A)),
+    "hi": ((0x0900, 0x097F),),
+    "brx": ((0x0900, 0x097F),),
+    "as": ((0x0980, 0x09FF),),
+}
+# Enum values and model names stay in English, so allow some Latin text.
+MIN_SCRIPT_SHARE = 0.6
+
+# Markdown sections the prompts ask for, checked on English answers where
+# the headings are not translated.
+REQUIRED_SECTIONS: dict[type[BaseModel], tuple[str, tuple[str, ...]]] = {
+    SymptomsAnalysisLLMResponse: (
+        "detailed_analysis",
+        (
+            "Likely Cause",
+            "Supporting Symptoms",
+            "Differential Diagnosis",
+            "Treatment Roadmap",
+            "Escalation Signs",
+        ),
+    ),
+    PlantCareLLMResponse: (
+        "detailed_guide",
+        ("Environment Setup", "Routine Care", "Seasonal Adjustments", "Troubleshooting"),
+    ),
+}
+
+MIN_LIST_ITEMS: dict[type[BaseModel], dict[str, int]] = {
+    PlantCareLLMResponse: {"key_tips": 3, "common_problems": 2},
+}
+
+# Constrained enum fields are always English and are skipped by the script check.
+ENUM_FIELDS = {"health_status", "severity", "confidence", "care_difficulty"}
+
+
+def _narrative_strings(value: Any, field_name: Optional[str] = None) -> list[str]:
+    if isinstance(value, BaseModel):
+        strings: list[str] = []
+        for name in type(value).model_fields:
+            strings.extend(_narrative_strings(getattr(value, name), name))
+        return strings
+    if isinstance(value, list):
+        return [text for item in value for text in _narrative_strings(item, field_name)]
+    if isinstance(value, str) and field_name not in ENUM_FIELDS:
+        return [value]
+    return []
+
+
+def script_share(text: str, language: str) -> Optional[float]:
+    """Fraction of letters in ``text`` that belong to the language's script."""
+    ranges = LANGUAGE_SCRIPT_RANGES.get(language)
+    if not ranges:
+        return None
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return None
+    in_script = sum(
+        1 for char in letters if any(start <= ord(char) <= end for start, end in ranges)
+    )
+    return in_script / len(letters)
+
+
+def find_quality_problems(response: BaseModel, language: str = "en") -> list[str]:
+    """Return human-readable problems; an empty list means the answer can be used."""
+    problems: list[str] = []
+
+    for name in type(response).model_fields:
+        value = getattr(response, name)
+        if isinstance(value, str) and not value.strip():
+            problems.append(f"{name} is empty")
+
+    for name, minimum in MIN_LIST_ITEMS.get(type(response), {}).items():
+        items = [item for item in getattr(response, name) if item.strip()]
+        if len(items) < minimum:
+            problems.append(f"{name} has {len(items)} items, expected at least {minimum}")
+
+    section_spec = REQUIRED_SECTIONS.get(type(response))
+    if section_spec is not None:
+        field_name, sections = section_spec
+        report = getattr(response, field_name) or ""
+        if language == "en":
+            lowered = report.lower()
+            missing = [section for section in sections if section.lower() not in lowered]
+            if missing:
+                problems.append(f"{field_name} is missing sections: {', '.join(missing)}")
+        elif report.count("#") < 2:
+            problems.append(f"{field_name} has no markdown sections")
+
+    share = script_share(" ".join(_narrative_strings(response)), language)
+    if share is not None and share < MIN_SCRIPT_SHARE:
+        problems.append(f"narrative text is only {share:.0%} in the {language} script")
+
+    return problems
+
@@ -0,0 +1,231 @@
+"""Admission control for OpenRouter calls: per-model slots, fair queuing, priority lanes.
+
+Every ensemble call acquires a slot for its model before it is sent. Each model
+allows ``LLM_MODEL_CONCURRENCY`` calls in flight per worker (overridable per
+model ID); further calls wait in that model's queue.
+
+Waiters are served interactive lane first, then batch (shadow checks and other
+re-analysis). Within a lane, callers are ordered by weighted fair queuing over
+tenants: a signed-in user is one tenant, and anonymous callers are grouped by
+client IP with ``LLM_ANONYMOUS_WEIGHT``. One tenant scripting many requests
+therefore only delays its own calls.
+
+The tenant and lane come from a context variable set by the analysis routes,
+like the pipeline trace and request deadline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Literal
+
+from app.core.config import settings
+from app.core.tracing import current_trace
+
+Lane = Literal["interactive", "batch"]
+LANE_PRIORITY: dict[str, int] = {"interactive": 0, "batch": 1}
+# Forget per-tenant finish tags once this many tenants have been seen.
+TENANT_PRUNE_THRESHOLD = 1000
+
+
+@dataclass(frozen=True, slots=True)
+class RequestIdentity:
+    tenant: str
+    lane: Lane = "interactive"
+    weight: float = 1.0
+
+
+_current_identity: ContextVar[RequestIdentity] = ContextVar(
+    "llm_request_identity", default=RequestIdentity("anonymous")
+)
+
+
+def caller_tenant(user_id: str | None, client_ip: str | None) -> str:
+    """Fair-queuing tenant: the signed-in user, else everyone behind the same client IP."""
+    return f"user:{user_id}" if user_id else f"ip:{client_ip or 'unknown'}"
+
+
+def set_request_identity(
+    user_id: str | None,
+    client_ip: str | None,
+    lane: Lane = "interactive",
+) -> RequestIdentity:
+    """Identify the current request for fair queuing; anonymous callers share their IP's share."""
+    weight = 1.0 if user_id else settings.LLM_ANONYMOUS_WEIGHT
+    identity = RequestIdentity(caller_tenant(user_id, client_ip), lane, weight)
+    _current_identity.set(identity)
+    return identity
+
+
+def use_lane(lane: Lane) -> RequestIdentity:
+    """Keep the current tenant but move its calls to another lane (e.g. a background task)."""
+    current = _current_identity.get()
+    identity = RequestIdentity(current.tenant, lane, current.weight)
+    _current_identity.set(identity)
+    return identity
+
+
+class _ModelQueue:
+    """Slots and fair wait queue for one model."""
+
+    def __init__(self, model_id: str, slots: int) -> None:
+        self.model_id = model_id
+        self.slots = max(slots, 1)
+        self.active = 0
+        self._waiters: list[tuple[int, float, int, asyncio.Future, str]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._tenant_finish: dict[str, float] = {}
+        self._waits_ms: deque[float] = deque(maxlen=200)
+        self.admitted = 0
+        self.queued_total = 0
+        self.max_queue_depth = 0
+
+    def _finish_tag(self, identity: RequestIdentity) -> float:
+        start = max(self._virtual_time, self._tenant_finish.get(identity.tenant, 0.0))
+        tag = start + 1.0 / max(identity.weight, 0.01)
+        self._tenant_finish[identity.tenant] = tag
+        return tag
+
+    async def acquire(self, identity: RequestIdentity) -> float:
+        """Wait for a slot; returns the time spent queued in seconds."""
+        self.admitted += 1
+        if self.active < self.slots and not self._waiters:
+            self.active += 1
+            self._waits_ms.append(0.0)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (
+            LANE_PRIORITY[identity.lane],
+            self._finish_tag(identity),
+            next(self._sequence),
+            future,
+            identity.lane,
+        )
+        heapq.heappush(self._waiters, entry)
+        self.queued_total += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter was cancelled; pass it on.
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(entry)
+                except ValueError:
+                    # release() already popped the entry while skipping cancelled waiters.
+                    pass
+                else:
+                    heapq.heapify(self._waiters)
+            raise
+        waited = time.perf_counter() - started
+        self._waits_ms.append(waited * 1000)
+        return waited
+
+    def release(self) -> None:
+        self.active -= 1
+        while self._waiters and self.active < self.slots:
+            _, tag, _, future, _ = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._virtual_time = tag
+            self.active += 1
+            future.set_result(None)
+        if len(self._tenant_finish) > TENANT_PRUNE_THRESHOLD:
+            # Tags at or behind the virtual clock no longer affect ordering.
+            self._tenant_finish = {
+                tenant: tag for tenant, tag in self._tenant_finish.items() if tag > self._virtual_time
+            }
+
+    def estimated_wait(self, service_seconds: float, lane: Lane = "interactive") -> float:
+        """Rough wait for a new call: the queue ahead of it drained ``slots`` calls at a time."""
+        if self.active < self.slots and not self._waiters:
+            return 0.0
+        ahead = sum(1 for entry in self._waiters if entry[0] <= LANE_PRIORITY[lane])
+        return (ahead + 1) / self.slots * service_seconds
+
+    def queue_depth(self) -> dict[str, int]:
+        depth = {lane: 0 for lane in LANE_PRIORITY}
+        for entry in self._waiters:
+            depth[entry[4]] += 1
+        return depth
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._waits_ms)
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "queued": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued_total": self.queued_total,
+            "wait_ms": {
+                "mean": round(sum(waits) / len(waits), 1) if waits else None,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else None,
+                "max": round(waits[-1], 1) if waits else None,
+            },
+        }
+
+
+class LLMScheduler:
+    """Per-model queues, created on first use."""
+
+    def __init__(self) -> None:
+        self._queues: dict[str, _ModelQueue] = {}
+
+    def _queue(self, model_id: str) -> _ModelQueue:
+        queue = self._queues.get(model_id)
+        if queue is None:
+            slots = settings.LLM_MODEL_CONCURRENCY_OVERRIDES.get(model_id, settings.LLM_MODEL_CONCURRENCY)
+            queue = self._queues[model_id] = _ModelQueue(model_id, slots)
+        return queue
+
+    @asynccontextmanager
+    async def slot(self, model_id: str) -> AsyncIterator[None]:
+        """Hold one of the model's slots for the enclosed call."""
+        queue = self._queue(model_id)
+        waited = await queue.acquire(_current_identity.get())
+        if waited:
+            trace = current_trace()
+            if trace is not None:
+                trace.details["llm_queue_wait_ms"] = round(
+                    trace.details.get("llm_queue_wait_ms", 0.0) + waited * 1000, 1
+                )
+        try:
+            yield
+        finally:
+            queue.release()
+
+    def estimated_wait(self, model_id: str, service_seconds: float) -> float:
+        queue = self._queues.get(model_id)
+        return queue.estimated_wait(service_seconds) if queue is not None else 0.0
+
+    def total_queued(self) -> int:
+        return sum(len(queue._waiters) for queue in self._queues.values())
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": self.total_queued(),
+            "models": {model_id: queue.stats() for model_id, queue in self._queues.items()},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_scheduler() -> LLMScheduler:
+    return LLMScheduler()
+
+
+def scheduler_stats() -> dict[str, Any]:
+    return get_llm_scheduler().stats()
@@ -1,3 +1,4 @@
+from functools import partial
 from typing import Optional, Type, TypeVar
 
 from pydantic import BaseModel
@@ -7,7 +8,19 @@ from app.models.analysis import (
     PlantCareLLMResponse,
     SymptomsAnalysisLLMResponse,
 )
-from .ensemble import ensemble_invoke_text, ensemble_invoke_vision, get_single_model
+from .ensemble import (
+    FINAL_VERIFIER_MODEL_ID,
+    VerifierError,
+    ensemble_invoke_text,
+    ensemble_invoke_vision,
+    get_single_model,
+    retry_verifier,
+)
+from .degradation import lite_mode_active
+from .openrouter_model import get_structured_runnable
+from .quality import find_quality_problems
+from .model_health import model_call
+from .vision_payload import VisionPayload
 
 StructuredModel = TypeVar("StructuredModel", bound=BaseModel)
 
@@ -29,40 +42,59 @@ class LeafAnalysisUtils:
         ]
         return any(marker in msg for marker in markers)
 
-    def _invoke_structured_text_with_retry(
+    async def _invoke_structured_text_with_retry(
         self,
         schema: Type[StructuredModel],
         primary_prompt: str,
         fallback_prompt: str,
+        language: str = "en",
     ) -> StructuredModel:
         """Run structured text invocation and retry once with tighter output bounds."""
+        quality_check = partial(find_quality_problems, language=language)
         try:
-            response = ensemble_invoke_text(primary_prompt, schema=schema)
+            response = await ensemble_invoke_text(
+                primary_prompt,
+                schema=schema,
+                quality_check=quality_check,
+            )
             if response is None:
                 raise RuntimeError("Ensemble returned None response")
             return response
         except Exception as exc:
             if not self._is_truncation_or_parse_error(exc):
                 raise
+            if isinstance(exc, VerifierError):
+                # The experts answered fine; only re-run the verifier with tighter limits.
+                response = await retry_verifier(fallback_prompt, exc, schema=schema)
+                if response is None:
+                    raise RuntimeError("Verifier returned None response after retry")
+                return response
 
-        response = ensemble_invoke_text(fallback_prompt, schema=schema)
+        response = await ensemble_invoke_text(
+            fallback_prompt,
+            schema=schema,
+            quality_check=quality_check,
+        )
         if response is None:
             raise RuntimeError("Ensemble returned None response after retry")
         return response
 
-    def _invoke_structured_vision_with_retry(
+    async def _invoke_structured_vision_with_retry(
         self,
         schema: Type[StructuredModel],
-        image_base64: str,
+        image_base64: str | VisionPayload,
         primary_prompt: str,
         fallback_prompt: str,
+        language: str = "en",
     ) -> StructuredModel:
         """Run structured vision invocation and retry once with tighter output bounds."""
+        quality_check = partial(find_quality_problems, language=language)
         try:
-            response = ensemble_invoke_vision(
+            response = await ensemble_invoke_vision(
                 image_base64=image_base64,
                 prompt=primary_prompt,
                 schema=schema,
+                quality_check=quality_check,
             )
             if response is None:
                 raise RuntimeError("Ensemble returned None response")
@@ -70,11 +102,18 @@ class LeafAnalysisUtils:
         except Exception as exc:
             if not self._is_truncation_or_parse_error(exc):
                 raise
+            if isinstance(exc, VerifierError):
+                # The experts answered fine; only re-run the verifier with tighter limits.
+                response = await retry_verifier(fallback_prompt, exc, schema=schema)
+                if response is None:
+                    raise RuntimeError("Verifier returned None response after retry")
+                return response
 
-        response = ensemble_invoke_vision(
+        response = await ensemble_invoke_vision(
             image_base64=image_base64,
             prompt=fallback_prompt,
             schema=schema,
+            quality_check=quality_check,
         )
         if response is None:
             raise RuntimeError("Ensemble returned None response after retry")
@@ -149,13 +188,14 @@ class LeafAnalysisUtils:
             f"Local context: {location_context}"
         )
 
-    def analyze_leaf_image(
+    async def analyze_leaf_image(
         self,
-        image_base64: str,
+        image_base64: str | VisionPayload,
         language: str = "en",
         location_context: Optional[str] = None,
     ) -> ImageAnalysisLLMResponse:
         """Analyze leaf image directly with vision model."""
+        lite = lite_mode_active()
         language_instruction = self._language_instruction(language)
         simplicity_instruction = self._simplicity_instruction()
         formatting_instruction = self._formatting_instruction()
@@ -170,7 +210,11 @@ class LeafAnalysisUtils:
         fallback_parts = [
             "You are an expert plant pathologist. Analyze this leaf image and return a valid structured response.",
             "Keep each field complete but concise so the full response fits safely within output limits.",
-            "Word limits: quick_summary 40-70 words, immediate_action 70-110 words, treatment 90-140 words, prevention 60-100 words, detailed_analysis 160-240 words in markdown with headings: Likely Diagnosis, Why This Matches, Differential Diagnosis, Treatment Plan, Monitoring and Escalation.",
+            (
+                "Word limits: quick_summary 25-40 words, immediate_action 40-60 words, treatment 50-80 words, prevention 30-50 words, detailed_analysis 80-120 words in markdown with headings: Likely Diagnosis, Why This Matches, Differential Diagnosis, Treatment Plan, Monitoring and Escalation."
+                if lite
+                else "Word limits: quick_summary 40-70 words, immediate_action 70-110 words, treatment 90-140 words, prevention 60-100 words, detailed_analysis 160-240 words in markdown with headings: Likely Diagnosis, Why This Matches, Differential Diagnosis, Treatment Plan, Monitoring and Escalation."
+            ),
             language_instruction,
             simplicity_instruction,
             formatting_instruction,
@@ -179,16 +223,18 @@ class LeafAnalysisUtils:
             prompt_parts.append(location_instruction)
             fallback_parts.append(location_instruction)
 
-        prompt = "\n\n".join(prompt_parts)
         fallback_prompt = "\n\n".join(fallback_parts)
-        return self._invoke_structured_vision_with_retry(
+        # Lite mode goes straight to the short, word-limited prompt.
+        prompt = fallback_prompt if lite else "\n\n".join(prompt_parts)
+        return await self._invoke_structured_vision_with_retry(
             schema=ImageAnalysisLLMResponse,
             image_base64=image_base64,
             primary_prompt=prompt,
             fallback_prompt=fallback_prompt,
+            language=language,
         )
 
-    def analyze_leaf_symptoms(
+    async def analyze_leaf_symptoms(
         self,
         symptoms_description: str,
         plant_type: str = "",
@@ -196,6 +242,7 @@ class LeafAnalysisUtils:
         location_context: Optional[str] = None,
     ) -> SymptomsAnalysisLLMResponse:
         """Analyze leaf symptoms directly with qwen model."""
+        lite = lite_mode_active()
         language_instruction = self._language_instruction(language)
         simplicity_instruction = self._simplicity_instruction()
         formatting_instruction = self._formatting_instruction()
@@ -213,7 +260,11 @@ class LeafAnalysisUtils:
             "You are an expert plant pathologist. Analyze these symptoms and return a valid structured response.",
             f"{plant_context}Symptoms: {symptoms_description}",
             "Keep outputs detailed but concise to avoid truncation.",
-            "Word limits: quick_summary 40-70 words, immediate_action 70-110 words, treatment_steps 90-140 words, what_to_watch 60-100 words, detailed_analysis 160-240 words in markdown with sections: Likely Cause, Supporting Symptoms, Differential Diagnosis, Treatment Roadmap, Escalation Signs.",
+            (
+                "Word limits: quick_summary 25-40 words, immediate_action 40-60 words, treatment_steps 50-80 words, what_to_watch 30-50 words, detailed_analysis 80-120 words in markdown with sections: Likely Cause, Supporting Symptoms, Differential Diagnosis, Treatment Roadmap, Escalation Signs."
+                if lite
+                else "Word limits: quick_summary 40-70 words, immediate_action 70-110 words, treatment_steps 90-140 words, what_to_watch 60-100 words, detailed_analysis 160-240 words in markdown with sections: Likely Cause, Supporting Symptoms, Differential Diagnosis, Treatment Roadmap, Escalation Signs."
+            ),
             language_instruction,
             simplicity_instruction,
             formatting_instruction,
@@ -222,21 +273,23 @@ class LeafAnalysisUtils:
             prompt_parts.append(location_instruction)
             fallback_parts.append(location_instruction)
 
-        prompt = "\n\n".join(prompt_parts)
         fallback_prompt = "\n\n".join(fallback_parts)
-        return self._invoke_structured_text_with_retry(
+        prompt = fallback_prompt if lite else "\n\n".join(prompt_parts)
+        return await self._invoke_structured_text_with_retry(
             schema=SymptomsAnalysisLLMResponse,
             primary_prompt=prompt,
             fallback_prompt=fallback_prompt,
+            language=language,
         )
 
-    def get_plant_care_tips(
+    async def get_plant_care_tips(
         self,
         plant_type: str,
         language: str = "en",
         location_context: Optional[str] = None,
     ) -> PlantCareLLMResponse:
         """Get plant care tips directly with qwen model."""
+        lite = lite_mode_active()
         language_instruction = self._language_instruction(language)
         simplicity_instruction = self._simplicity_instruction()
         formatting_instruction = self._formatting_instruction()
@@ -251,7 +304,11 @@ class LeafAnalysisUtils:
         fallback_parts = [
             f"Provide comprehensive care guidelines for {plant_type} and return a valid structured response.",
             "Keep content detailed but concise to avoid truncation.",
-            "Word limits: quick_overview 40-70 words; essential_care.light 40-70 words; essential_care.water 40-70 words; essential_care.soil 40-70 words; each key_tip 12-24 words; each common_problem 18-36 words; detailed_guide 160-240 words in markdown with Environment Setup, Routine Care, Seasonal Adjustments, Troubleshooting.",
+            (
+                "Word limits: quick_overview 25-40 words; essential_care.light 20-35 words; essential_care.water 20-35 words; essential_care.soil 20-35 words; each key_tip 8-16 words; each common_problem 12-24 words; detailed_guide 80-120 words in markdown with Environment Setup, Routine Care, Seasonal Adjustments, Troubleshooting."
+                if lite
+                else "Word limits: quick_overview 40-70 words; essential_care.light 40-70 words; essential_care.water 40-70 words; essential_care.soil 40-70 words; each key_tip 12-24 words; each common_problem 18-36 words; detailed_guide 160-240 words in markdown with Environment Setup, Routine Care, Seasonal Adjustments, Troubleshooting."
+            ),
             language_instruction,
             simplicity_instruction,
             formatting_instruction,
@@ -260,15 +317,16 @@ class LeafAnalysisUtils:
             prompt_parts.append(location_instruction)
             fallback_parts.append(location_instruction)
 
-        prompt = "\n\n".join(prompt_parts)
         fallback_prompt = "\n\n".join(fallback_parts)
-        return self._invoke_structured_text_with_retry(
+        prompt = fallback_prompt if lite else "\n\n".join(prompt_parts)
+        return await self._invoke_structured_text_with_retry(
             schema=PlantCareLLMResponse,
             primary_prompt=prompt,
             fallback_prompt=fallback_prompt,
+            language=language,
         )
 
-    def translate_image_analysis(
+    async def translate_image_analysis(
         self,
         response: ImageAnalysisLLMResponse,
         source_language: str,
@@ -295,8 +353,9 @@ class LeafAnalysisUtils:
             f"Input JSON:\n{response.model_dump_json(indent=2)}"
         )
 
-        model = get_single_model().with_structured_output(ImageAnalysisLLMResponse)
-        translated = model.invoke(prompt)
+        model = get_structured_runnable(get_single_model(), ImageAnalysisLLMResponse)
+        async with model_call(FINAL_VERIFIER_MODEL_ID):
+            translated = await model.ainvoke(prompt)
         if translated is None:
             raise RuntimeError("Translation model returned None response")
         return translated
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""Per-model image payloads for the vision experts, and what they cost.
+
+The image handed to each vision expert is cropped to the leaf and encoded at
+that model's target resolution (``VISION_IMAGE_MAX_EDGE`` /
+``VISION_IMAGE_JPEG_QUALITY``, with per-model overrides). Models that share a
+target share one encoding.
+
+Every expert call records the payload bytes, an image-token estimate, the
+prompt tokens the provider reported and the call latency. Averages per model
+are reported so the targets can be tuned against answer latency.
+"""
+
+from __future__ import annotations
+
+import base64
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping, Optional
+
+from app.core.config import settings
+from app.core.tracing import current_trace
+
+# (longest edge in pixels, JPEG quality)
+ImageTarget = tuple[int, int]
+# Vision encoders typically turn each 28x28-pixel patch into one token.
+TOKEN_PATCH_PIXELS = 28
+
+
+def vision_image_target(model_id: str) -> ImageTarget:
+    return (
+        settings.VISION_IMAGE_MAX_EDGE_OVERRIDES.get(model_id, settings.VISION_IMAGE_MAX_EDGE),
+        settings.VISION_IMAGE_JPEG_QUALITY_OVERRIDES.get(model_id, settings.VISION_IMAGE_JPEG_QUALITY),
+    )
+
+
+def vision_image_targets(model_ids: Iterable[str]) -> tuple[ImageTarget, ...]:
+    """Distinct encodings needed for ``model_ids``."""
+    return tuple(dict.fromkeys(vision_image_target(model_id) for model_id in model_ids))
+
+
+def estimate_image_tokens(width: int, height: int) -> Optional[int]:
+    if not width or not height:
+        return None
+    return math.ceil(width / TOKEN_PATCH_PIXELS) * math.ceil(height / TOKEN_PATCH_PIXELS)
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedImage:
+    base64: str
+    size_bytes: int
+    width: int = 0
+    height: int = 0
+
+    @classmethod
+    def from_jpeg(cls, data: bytes, width: int = 0, height: int = 0) -> "EncodedImage":
+        return cls(base64.b64encode(data).decode("utf-8"), len(data), width, height)
+
+    @property
+    def estimated_tokens(self) -> Optional[int]:
+        return estimate_image_tokens(self.width, self.height)
+
+
+@dataclass(frozen=True)
+class VisionPayload:
+    """Encoded images keyed by target, with ``default`` for models without their own."""
+
+    default: EncodedImage
+    images: Mapping[ImageTarget, EncodedImage]
+
+    @classmethod
+    def from_base64(cls, image_base64: str) -> "VisionPayload":
+        """One pre-encoded image for every model (dimensions unknown)."""
+        return cls(EncodedImage(image_base64, len(image_base64) * 3 // 4), {})
+
+    @classmethod
+    def from_encoded(cls, encoded: Mapping[ImageTarget, tuple[bytes, int, int]]) -> "VisionPayload":
+        """Build from the ``{target: (jpeg, width, height)}`` map made by the image workers."""
+        images = {target: EncodedImage.from_jpeg(*jpeg) for target, jpeg in encoded.items()}
+        largest = max(images.values(), key=lambda image: image.size_bytes)
+        return cls(largest, images)
+
+    def for_model(self, model_id: str) -> EncodedImage:
+        return self.images.get(vision_image_target(model_id), self.default)
+
+
+class _PayloadTotals:
+    __slots__ = ("calls", "bytes", "estimated_tokens", "input_tokens", "usage_reports", "latency")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.bytes = 0
+        self.estimated_tokens = 0
+        self.input_tokens = 0
+        self.usage_reports = 0
+        self.latency = 0.0
+
+
+_totals: defaultdict[str, _PayloadTotals] = defaultdict(_PayloadTotals)
+
+
+def _reported_input_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens")
+
+
+def record_vision_call(model_id: str, image: EncodedImage, latency: float, response: Any = None) -> None:
+    """Add one successful expert call to the per-model totals and the request trace."""
+    input_tokens = _reported_input_tokens(response)
+    totals = _totals[model_id]
+    totals.calls += 1
+    totals.bytes += image.size_bytes
+    totals.estimated_tokens += image.estimated_tokens or 0
+    totals.latency += latency
+    if input_tokens is not None:
+        totals.input_tokens += input_tokens
+        totals.usage_reports += 1
+
+    trace = current_trace()
+    if trace is not None:
+        trace.details.setdefault("vision_payload", {})[model_id] = {
+            "bytes": image.size_bytes,
+            "width": image.width,
+            "height": image.height,
+            "estimated_image_tokens": image.estimated_tokens,
+            "input_tokens": input_tokens,
+            "latency_ms": round(latency * 1000, 1),
+        }
+
+
+def vision_payload_stats() -> dict[str, Any]:
+    stats: dict[str, Any] = {}
+    for model_id, totals in _totals.items():
+        max_edge, quality = vision_image_target(model_id)
+        stats[model_id] = {
+            "max_edge": max_edge,
+            "jpeg_quality": quality,
+            "calls": totals.calls,
+            "mean_bytes": round(totals.bytes / totals.calls),
+            "mean_estimated_image_tokens": round(totals.estimated_tokens / totals.calls),
+            "mean_input_tokens": (
+                round(totals.input_tokens / totals.usage_reports) if totals.usage_reports else None
+            ),
+            "mean_latency_ms": round(totals.latency / totals.calls * 1000, 1),
+        }
+    return stats
@@ -1,16 +1,26 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.db import db
+from app.db import db, migrations
 from app.api.main import api_router
 from app import middleware
 from app.core.config import settings
+from app.llm_core import close_model_clients
+from app.utils import image_workers, io_workers, phash_index
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.connect(app=app)
+    await phash_index.start(app)
+    image_workers.start(app)
+    io_workers.start(app)
     yield
+    await migrations.shutdown(app)
+    await phash_index.shutdown(app)
+    await close_model_clients()
+    io_workers.shutdown(app)
+    image_workers.shutdown(app)
 
 
 app = FastAPI(
@@ -26,6 +36,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Analysis-Cache", "X-Analysis-Experts", "X-Analysis-Mode"],
 )
 
 app.include_router(api_router)
@@ -74,6 +74,23 @@ class EmbeddingGenerator:
         except Exception as e:
             logger.error(f"Query embedding generation failed: {str(e)}")
             raise
+    
+    async def agenerate_query_embedding(self, text: str) -> List[float]:
+        """
+        Generate a query embedding without blocking the event loop.
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Query embedding vector
+        """
+        try:
+            embedding = await self.query_embeddings.aembed_query(text)
+            return embedding
+        except Exception as e:
+            logger.error(f"Query embedding generation failed: {str(e)}")
+            raise
 
 
 # Global instance
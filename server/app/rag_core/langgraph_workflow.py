@@ -159,7 +159,7 @@ class RAGWorkflow:
             if state.analysis_type == "symptoms":
                 # For symptoms, enhance the analysis request with RAG context
                 enhanced_description = f"{state.disease_description}{context_prompt}"
-                analysis = leaf_analysis.analyze_leaf_symptoms(
+                analysis = await leaf_analysis.analyze_leaf_symptoms(
                     symptoms_description=enhanced_description,
                     plant_type=state.plant_type or ""
                 )
@@ -0,0 +1,192 @@
+"""Load shedding in front of the analysis endpoints.
+
+Each analysis request is admitted before any work starts. It is refused early,
+with a ``Retry-After`` header, when:
+
+- its caller already has ``ANALYSIS_MAX_IN_FLIGHT_PER_CALLER`` analyses running, or
+  ``ANALYSIS_MAX_IN_FLIGHT_PER_ANONYMOUS_IP`` for signed-out callers, who are
+  bucketed by client IP and may share it behind NAT (429),
+- the worker already runs ``ANALYSIS_MAX_IN_FLIGHT`` analyses (503), or
+- the expected LLM queue wait, estimated from the scheduler queues and each
+  model's observed median latency, exceeds ``ANALYSIS_QUEUE_WAIT_SLO_SECONDS`` (503).
+
+Rejecting up front is cheaper for everyone than accepting a request that would
+only time out against its deadline. Routes opt in with
+``Depends(analysis_admission(kind))``; history, image views and other cheap
+endpoints are never shed.
+
+Streaming routes take the ``AdmissionSlot`` as a parameter and return an
+``AdmittedStreamingResponse``, which releases it once the last event is sent.
+The dependency's own cleanup cannot be relied on for that: older FastAPI
+releases run it before a streaming body is sent.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Callable, Literal, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.llm_core.ensemble import estimated_queue_wait
+from app.llm_core.scheduler import caller_tenant
+
+AnalysisKind = Literal["text", "vision", "verifier"]
+# Weight of the newest analysis in the running mean duration used for Retry-After.
+DURATION_EWMA_ALPHA = 0.2
+
+
+class AnalysisAdmission:
+    """In-flight counters and shed decisions for one worker."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self._per_caller: Counter[str] = Counter()
+        self.admitted = 0
+        self.shed: Counter[str] = Counter()
+        self.mean_duration: float | None = None
+
+    def _retry_after(self, seconds: float | None) -> str:
+        if seconds is None:
+            seconds = self.mean_duration or 1.0
+        return str(max(1, math.ceil(seconds)))
+
+    def _reject(self, reason: str, status_code: int, detail: str, retry_after: float | None) -> HTTPException:
+        self.shed[reason] += 1
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": self._retry_after(retry_after)},
+        )
+
+    def admit(self, kind: AnalysisKind, caller: str, anonymous: bool = False) -> None:
+        """Count the request in, or raise a 429/503 ``HTTPException`` to shed it."""
+        per_caller_limit = (
+            settings.ANALYSIS_MAX_IN_FLIGHT_PER_ANONYMOUS_IP
+            if anonymous
+            else settings.ANALYSIS_MAX_IN_FLIGHT_PER_CALLER
+        )
+        if per_caller_limit > 0 and self._per_caller[caller] >= per_caller_limit:
+            raise self._reject(
+                "caller_limit",
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Too many analyses in progress for this caller, retry shortly",
+                None,
+            )
+        if settings.ANALYSIS_MAX_IN_FLIGHT > 0 and self.in_flight >= settings.ANALYSIS_MAX_IN_FLIGHT:
+            raise self._reject(
+                "in_flight_limit",
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Analysis service is at capacity, retry shortly",
+                None,
+            )
+        slo = settings.ANALYSIS_QUEUE_WAIT_SLO_SECONDS
+        if slo > 0:
+            expected_wait = estimated_queue_wait(kind)
+            if expected_wait > slo:
+                raise self._reject(
+                    "queue_wait",
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    f"Analysis queue is saturated (expected wait {expected_wait:.0f}s), retry later",
+                    expected_wait - slo,
+                )
+
+        self.in_flight += 1
+        self._per_caller[caller] += 1
+        self.admitted += 1
+
+    def release(self, caller: str, duration: float) -> None:
+        self.in_flight -= 1
+        self._per_caller[caller] -= 1
+        if self._per_caller[caller] <= 0:
+            del self._per_caller[caller]
+        if self.mean_duration is None:
+            self.mean_duration = duration
+        else:
+            self.mean_duration += DURATION_EWMA_ALPHA * (duration - self.mean_duration)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "callers_in_flight": len(self._per_caller),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "mean_duration_seconds": round(self.mean_duration, 2) if self.mean_duration is not None else None,
+            "expected_wait_seconds": {
+                kind: round(estimated_queue_wait(kind), 2) for kind in ("text", "vision", "verifier")
+            },
+        }
+
+
+_admission = AnalysisAdmission()
+
+
+class AdmissionSlot:
+    """One admitted analysis; released once, by the dependency or by the response that owns it."""
+
+    def __init__(self, admission: AnalysisAdmission, caller: str) -> None:
+        self._admission = admission
+        self.caller = caller
+        self.started = time.monotonic()
+        self.handed_over = False
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._admission.release(self.caller, time.monotonic() - self.started)
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """Streaming response that holds its analysis slot until the body has been sent."""
+
+    def __init__(self, content: Any, slot: Optional[AdmissionSlot] = None, **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.slot = slot
+        if slot is not None:
+            slot.handed_over = True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.slot is not None:
+                self.slot.release()
+
+
+def get_analysis_admission() -> AnalysisAdmission:
+    return _admission
+
+
+def admission_stats() -> dict[str, Any]:
+    return _admission.stats()
+
+
+def analysis_admission(kind: AnalysisKind) -> Callable[[Request], AsyncIterator[AdmissionSlot]]:
+    """Route dependency that admits the request and yields its slot.
+
+    The slot is released when the route is done, unless an
+    ``AdmittedStreamingResponse`` took it over to release after its last event.
+    """
+
+    async def dependency(req: Request) -> AsyncIterator[AdmissionSlot]:
+        user = getattr(req.state, "user", None)
+        caller = caller_tenant(
+            user.email if user else None,
+            req.client.host if req.client else None,
+        )
+        _admission.admit(kind, caller, anonymous=not user)
+        slot = AdmissionSlot(_admission, caller)
+        try:
+            yield slot
+        finally:
+            if not slot.handed_over:
+                slot.release()
+
+    return dependency
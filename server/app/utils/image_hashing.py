@@ -2,27 +2,107 @@
 
 from __future__ import annotations
 
-from io import BytesIO
-from typing import Optional
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Any, Iterator, Optional
 
 import imagehash
+import numpy as np
 from PIL import Image
 
+PHASH_BITS = 64
+PHASH_BAND_COUNT = 4
+PHASH_BAND_BITS = PHASH_BITS // PHASH_BAND_COUNT
+_BAND_MASK = (1 << PHASH_BAND_BITS) - 1
+
+
+@dataclass(slots=True)
+class PHashMatch:
+    entry_id: str
+    distance: int
+    phash: int
+
+
+# pHash only looks at a 32x32 thumbnail, so uploads are decoded at reduced size.
+PHASH_DECODE_EDGE = 256
+
+
+def phash_hex_from_gray(gray: np.ndarray) -> str:
+    """Compute 64-bit perceptual hash as hex string from an already-decoded grayscale array."""
+    return str(imagehash.phash(Image.fromarray(gray, mode="L"), hash_size=8))
+
 
 def compute_phash_hex(image_bytes: bytes) -> str:
     """Compute 64-bit perceptual hash as hex string for an image payload."""
-    with Image.open(BytesIO(image_bytes)) as image:
-        # Normalize mode for stable hash generation across source formats.
-        normalized = image.convert("RGB")
-        return str(imagehash.phash(normalized, hash_size=8))
+    from app.utils.image_preprocessing import LeafImagePipeline
+
+    # EXIF orientation stays unapplied, as in hashes stored by the earlier PIL-based decode.
+    pipeline = LeafImagePipeline(
+        image_bytes,
+        target_edge=PHASH_DECODE_EDGE,
+        grayscale=True,
+        ignore_orientation=True,
+    )
+    return pipeline.phash_hex()
 
 
-def phash_hamming_distance(hash_a: str, hash_b: str) -> Optional[int]:
-    """Return Hamming distance between two pHash hex values."""
-    if not hash_a or not hash_b:
+def phash_hex_to_int(hash_hex: Optional[str]) -> Optional[int]:
+    """Convert a pHash hex string to an unsigned 64-bit integer."""
+    if not hash_hex:
         return None
     try:
-        # imagehash subtraction can return numpy scalar types; normalize to builtin int.
-        return int(imagehash.hex_to_hash(hash_a) - imagehash.hex_to_hash(hash_b))
-    except Exception:
+        value = int(hash_hex, 16)
+    except (TypeError, ValueError):
+        return None
+    if value >> PHASH_BITS:
         return None
+    return value
+
+
+def phash_bands(value: int) -> tuple[int, ...]:
+    """Split a 64-bit pHash into equal-width bands, most significant band first."""
+    return tuple(
+        (value >> (PHASH_BITS - PHASH_BAND_BITS * (index + 1))) & _BAND_MASK
+        for index in range(PHASH_BAND_COUNT)
+    )
+
+
+def band_neighbours(band: int, radius: int) -> Iterator[int]:
+    """Yield every band value within ``radius`` bit flips of ``band``."""
+    yield band
+    for flips in range(1, radius + 1):
+        for positions in combinations(range(PHASH_BAND_BITS), flips):
+            flipped = band
+            for position in positions:
+                flipped ^= 1 << position
+            yield flipped
+
+
+def band_probe_radius(max_distance: int) -> int:
+    """Per-band search radius that still guarantees recall at ``max_distance``.
+
+    If two hashes differ in at most ``max_distance`` bits, at least one of the
+    bands differs in at most ``max_distance // PHASH_BAND_COUNT`` bits.
+    """
+    return max(0, max_distance) // PHASH_BAND_COUNT
+
+
+def phash_to_int64(value: int) -> int:
+    """Reinterpret an unsigned 64-bit pHash as a signed int64 for BSON storage."""
+    return value - (1 << PHASH_BITS) if value >> (PHASH_BITS - 1) else value
+
+
+def phash_from_int64(value: int) -> int:
+    """Inverse of ``phash_to_int64``."""
+    return value + (1 << PHASH_BITS) if value < 0 else value
+
+
+def phash_storage_fields(hash_hex: Optional[str], prefix: str = "phash") -> dict[str, Any]:
+    """Return int64 and per-band fields used for index-assisted lookups in Mongo."""
+    value = phash_hex_to_int(hash_hex)
+    if value is None:
+        return {}
+    fields: dict[str, Any] = {f"{prefix}_int": phash_to_int64(value)}
+    for index, band in enumerate(phash_bands(value)):
+        fields[f"{prefix}_band_{index}"] = band
+    return fields
@@ -1,19 +1,77 @@
-"""OpenCV preprocessing pipeline for noisy mobile leaf images."""
+"""OpenCV preprocessing pipeline for noisy mobile leaf images.
+
+``LeafImagePipeline`` decodes an upload once and serves hashing, preprocessing
+and vision encoding from that one array. Oversized JPEGs are decoded at a
+reduced DCT scale (1/2, 1/4 or 1/8) that still covers the size actually needed,
+and the filter stages write into existing buffers where OpenCV allows it, so
+only a few frame-sized arrays are alive at once.
+"""
 
 from __future__ import annotations
 
-from typing import Any
+from io import BytesIO
+from typing import Any, Optional, Sequence
 
 import cv2
 import numpy as np
+from PIL import Image
 
-
-MAX_EDGE = 1400
+from app.utils.image_hashing import phash_hex_from_gray
 
 
-def _decode_image(image_bytes: bytes) -> np.ndarray:
+MAX_EDGE = 1400
+COMPARE_STRIP_HEIGHT = 480
+
+# (longest edge in pixels, JPEG quality) of an image sent to a vision model.
+VisionTarget = tuple[int, int]
+# (x, y, width, height)
+Box = tuple[int, int, int, int]
+
+# JPEG DCT scale factors OpenCV can decode at, largest first.
+_REDUCED_DECODE_FLAGS = {
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+}
+
+
+def _source_size(image_bytes: bytes) -> Optional[tuple[int, int]]:
+    """Width and height from the image header, without decoding pixels."""
+    try:
+        with Image.open(BytesIO(image_bytes)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def _decode_reduction(source_size: Optional[tuple[int, int]], target_edge: int) -> int:
+    """Largest decode scale-down that keeps the longest edge at or above ``target_edge``."""
+    if source_size is None:
+        return 1
+    longest_edge = max(source_size)
+    for factor in _REDUCED_DECODE_FLAGS:
+        if longest_edge // factor >= target_edge:
+            return factor
+    return 1
+
+
+def _decode_image(
+    image_bytes: bytes,
+    reduction: int = 1,
+    grayscale: bool = False,
+    ignore_orientation: bool = False,
+) -> np.ndarray:
+    if reduction > 1:
+        flag = _REDUCED_DECODE_FLAGS[reduction][1 if grayscale else 0]
+    else:
+        flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    if ignore_orientation:
+        flag |= cv2.IMREAD_IGNORE_ORIENTATION
     array = np.frombuffer(image_bytes, dtype=np.uint8)
-    image = cv2.imdecode(array, cv2.IMREAD_COLOR)
+    try:
+        image = cv2.imdecode(array, flag)
+    except cv2.error as e:
+        raise ValueError(f"Unable to decode image bytes: {e}") from e
     if image is None:
         raise ValueError("Unable to decode image bytes")
     return image
@@ -26,13 +84,13 @@ def _encode_jpeg(image: np.ndarray, quality: int = 92) -> bytes:
     return encoded.tobytes()
 
 
-def _resize_if_needed(image: np.ndarray) -> tuple[np.ndarray, bool]:
+def _resize_if_needed(image: np.ndarray, max_edge: int = MAX_EDGE) -> tuple[np.ndarray, bool]:
     height, width = image.shape[:2]
     longest_edge = max(height, width)
-    if longest_edge <= MAX_EDGE:
+    if longest_edge <= max_edge:
         return image, False
 
-    scale = MAX_EDGE / float(longest_edge)
+    scale = max_edge / float(longest_edge)
     resized = cv2.resize(
         image,
         (int(width * scale), int(height * scale)),
@@ -41,63 +99,94 @@ def _resize_if_needed(image: np.ndarray) -> tuple[np.ndarray, bool]:
     return resized, True
 
 
-def _apply_clahe(image_bgr: np.ndarray) -> np.ndarray:
-    lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB)
-    l_channel, a_channel, b_channel = cv2.split(lab)
+def _apply_clahe(image_bgr: np.ndarray, lab: Optional[np.ndarray] = None) -> np.ndarray:
+    """Equalise lightness in place and return the LAB buffer for reuse as scratch space."""
+    lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB, dst=lab)
+    l_channel = cv2.extractChannel(lab, 0)
 
     clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8, 8))
     l_enhanced = clahe.apply(l_channel)
 
-    merged = cv2.merge((l_enhanced, a_channel, b_channel))
-    return cv2.cvtColor(merged, cv2.COLOR_LAB2BGR)
+    cv2.insertChannel(l_enhanced, lab, 0)
+    cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=image_bgr)
+    return lab
 
 
-def _leaf_mask(image_bgr: np.ndarray) -> tuple[np.ndarray, float, bool]:
-    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
+def _leaf_mask(
+    image_bgr: np.ndarray,
+    hsv: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, float, bool, Optional[Box]]:
+    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV, dst=hsv)
 
     # Green healthy leaf ranges.
     mask_green = cv2.inRange(hsv, np.array([25, 35, 25]), np.array([95, 255, 255]))
     # Brown/yellow diseased patches ranges.
     mask_brown = cv2.inRange(hsv, np.array([5, 35, 20]), np.array([30, 255, 235]))
 
-    combined = cv2.bitwise_or(mask_green, mask_brown)
+    cleaned = cv2.bitwise_or(mask_green, mask_brown, dst=mask_green)
 
     kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    cleaned = cv2.morphologyEx(combined, cv2.MORPH_OPEN, kernel, iterations=1)
-    cleaned = cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel, iterations=2)
+    cv2.morphologyEx(cleaned, cv2.MORPH_OPEN, kernel, dst=cleaned, iterations=1)
+    cv2.morphologyEx(cleaned, cv2.MORPH_CLOSE, kernel, dst=cleaned, iterations=2)
 
     full_pixels = cleaned.shape[0] * cleaned.shape[1]
     mask_ratio = float(cv2.countNonZero(cleaned)) / float(full_pixels) if full_pixels else 0.0
 
     # If the color mask is too weak, use full frame as fallback.
     if mask_ratio < 0.01:
-        return np.full_like(cleaned, 255), mask_ratio, False
+        cleaned.fill(255)
+        return cleaned, mask_ratio, False, None
 
     contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     if not contours:
-        return cleaned, mask_ratio, False
+        return cleaned, mask_ratio, False, None
 
     largest = max(contours, key=cv2.contourArea)
-    contour_mask = np.zeros_like(cleaned)
+    contour_mask = mask_brown
+    contour_mask.fill(0)
     cv2.drawContours(contour_mask, [largest], -1, 255, thickness=cv2.FILLED)
 
     contour_ratio = float(cv2.countNonZero(contour_mask)) / float(full_pixels) if full_pixels else 0.0
     if contour_ratio < 0.01:
-        return cleaned, mask_ratio, False
+        return cleaned, mask_ratio, False, None
+
+    return contour_mask, contour_ratio, True, cv2.boundingRect(largest)
+
+
+def _padded_box(box: Box, shape: tuple[int, ...], padding: float) -> Box:
+    """Grow ``box`` by ``padding`` of its size on every side, clipped to the frame."""
+    x, y, width, height = box
+    pad_x = int(round(width * padding))
+    pad_y = int(round(height * padding))
+    left, top = max(x - pad_x, 0), max(y - pad_y, 0)
+    right = min(x + width + pad_x, shape[1])
+    bottom = min(y + height + pad_y, shape[0])
+    return left, top, right - left, bottom - top
 
-    return contour_mask, contour_ratio, True
 
+def _encode_vision_targets(
+    image: np.ndarray,
+    targets: Sequence[VisionTarget],
+) -> dict[VisionTarget, tuple[bytes, int, int]]:
+    """JPEG-encode ``image`` once per ``(max_edge, quality)`` target, never upscaling."""
+    encoded: dict[VisionTarget, tuple[bytes, int, int]] = {}
+    for max_edge, quality in targets:
+        fitted, _ = _resize_if_needed(image, max_edge)
+        encoded[(max_edge, quality)] = (
+            _encode_jpeg(fitted, quality=quality),
+            int(fitted.shape[1]),
+            int(fitted.shape[0]),
+        )
+    return encoded
 
-def _build_compare_strip(original: np.ndarray, processed: np.ndarray) -> np.ndarray:
-    target_height = min(480, max(original.shape[0], processed.shape[0]))
 
-    def _fit_height(img: np.ndarray, h: int) -> np.ndarray:
-        scale = h / float(img.shape[0])
-        return cv2.resize(img, (int(img.shape[1] * scale), h), interpolation=cv2.INTER_AREA)
+def _fit_height(img: np.ndarray, h: int) -> np.ndarray:
+    scale = h / float(img.shape[0])
+    return cv2.resize(img, (int(img.shape[1] * scale), h), interpolation=cv2.INTER_AREA)
 
-    left = _fit_height(original, target_height)
-    right = _fit_height(processed, target_height)
 
+def _build_compare_strip(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Label the original and preprocessed thumbnails side by side."""
     strip = np.hstack([left, right])
 
     cv2.putText(strip, "Original", (14, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (255, 255, 255), 2, cv2.LINE_AA)
@@ -105,30 +194,123 @@ def _build_compare_strip(original: np.ndarray, processed: np.ndarray) -> np.ndar
     return strip
 
 
-def preprocess_leaf_image_bytes(image_bytes: bytes) -> tuple[bytes, bytes, dict[str, Any]]:
-    """Apply CLAHE + HSV masking + Gaussian blur and return processed + comparison images."""
-    original = _decode_image(image_bytes)
-    resized, resized_flag = _resize_if_needed(original)
-
-    clahe_img = _apply_clahe(resized)
-    mask, mask_ratio, used_largest_contour = _leaf_mask(clahe_img)
-
-    isolated = cv2.bitwise_and(clahe_img, clahe_img, mask=mask)
-    processed = cv2.GaussianBlur(isolated, (5, 5), 0)
-
-    compare_strip = _build_compare_strip(resized, processed)
-
-    processed_bytes = _encode_jpeg(processed)
-    compare_bytes = _encode_jpeg(compare_strip, quality=90)
-
-    meta: dict[str, Any] = {
-        "resized": bool(resized_flag),
-        "mask_ratio": float(mask_ratio),
-        "used_largest_contour": bool(used_largest_contour),
-        "shape": {
-            "height": int(processed.shape[0]),
-            "width": int(processed.shape[1]),
-        },
-    }
-
-    return processed_bytes, compare_bytes, meta
+class LeafImagePipeline:
+    """One decode of an uploaded image, shared by pHash, preprocessing and vision encoding.
+
+    ``target_edge`` is the longest edge the caller needs; larger JPEGs are
+    decoded at the coarsest DCT scale that still provides it.
+    """
+
+    def __init__(
+        self,
+        image_bytes: bytes,
+        target_edge: int = MAX_EDGE,
+        grayscale: bool = False,
+        ignore_orientation: bool = False,
+    ) -> None:
+        source_size = _source_size(image_bytes)
+        self.reduction = _decode_reduction(source_size, target_edge)
+        self.image = _decode_image(
+            image_bytes,
+            self.reduction,
+            grayscale=grayscale,
+            ignore_orientation=ignore_orientation,
+        )
+        self.source_size = source_size or (int(self.image.shape[1]), int(self.image.shape[0]))
+
+    def phash_hex(self) -> str:
+        """pHash of the decoded array."""
+        if self.image.ndim == 2:
+            return phash_hex_from_gray(self.image)
+        return phash_hex_from_gray(cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY))
+
+    def encode_vision_images(
+        self,
+        vision_targets: Sequence[VisionTarget],
+    ) -> dict[VisionTarget, tuple[bytes, int, int]]:
+        """Vision model inputs from the unprocessed image."""
+        return _encode_vision_targets(self.image, vision_targets)
+
+    def preprocess(
+        self,
+        vision_targets: Sequence[VisionTarget] = (),
+        roi_padding: Optional[float] = None,
+    ) -> tuple[bytes, bytes, dict[str, Any], dict[VisionTarget, tuple[bytes, int, int]]]:
+        """Apply CLAHE + HSV masking + Gaussian blur and return processed + comparison images.
+
+        Also returns the vision model inputs: the processed image cropped to the
+        leaf's padded bounding box (when ``roi_padding`` is set and a leaf contour
+        was found), encoded once per target as ``{target: (jpeg, width, height)}``.
+
+        The filters run in place on the decoded array, so the pipeline cannot
+        be used again afterwards.
+        """
+        frame, resized_flag = _resize_if_needed(self.image)
+        # Drop the full-size decode as soon as the working frame exists.
+        self.image = None
+
+        # Thumbnail the original before the frame is overwritten in place.
+        strip_height = min(COMPARE_STRIP_HEIGHT, frame.shape[0])
+        original_thumb = _fit_height(frame, strip_height)
+
+        scratch = _apply_clahe(frame)
+        mask, mask_ratio, used_largest_contour, leaf_box = _leaf_mask(frame, hsv=scratch)
+        del scratch
+
+        frame[mask == 0] = 0
+        del mask
+        processed = cv2.GaussianBlur(frame, (5, 5), 0, dst=frame)
+
+        compare_strip = _build_compare_strip(original_thumb, _fit_height(processed, strip_height))
+        del original_thumb
+
+        processed_bytes = _encode_jpeg(processed)
+        compare_bytes = _encode_jpeg(compare_strip, quality=90)
+        del compare_strip
+
+        roi = processed
+        roi_box: Optional[Box] = None
+        if roi_padding is not None and leaf_box is not None:
+            roi_box = _padded_box(leaf_box, processed.shape, roi_padding)
+            x, y, width, height = roi_box
+            roi = processed[y : y + height, x : x + width]
+        vision_images = _encode_vision_targets(roi, vision_targets)
+
+        meta: dict[str, Any] = {
+            "resized": bool(resized_flag),
+            "decode_reduction": self.reduction,
+            "source_shape": {"height": int(self.source_size[1]), "width": int(self.source_size[0])},
+            "mask_ratio": float(mask_ratio),
+            "used_largest_contour": bool(used_largest_contour),
+            "shape": {
+                "height": int(processed.shape[0]),
+                "width": int(processed.shape[1]),
+            },
+            "roi": (
+                {"x": roi_box[0], "y": roi_box[1], "width": roi_box[2], "height": roi_box[3]}
+                if roi_box is not None
+                else None
+            ),
+            "roi_area_ratio": round(roi.shape[0] * roi.shape[1] / float(processed.shape[0] * processed.shape[1]), 4),
+            "full_frame_bytes": len(processed_bytes),
+        }
+
+        return processed_bytes, compare_bytes, meta, vision_images
+
+
+def preprocess_leaf_image_bytes(
+    image_bytes: bytes,
+    vision_targets: Sequence[VisionTarget] = (),
+    roi_padding: Optional[float] = None,
+) -> tuple[bytes, bytes, dict[str, Any], dict[VisionTarget, tuple[bytes, int, int]]]:
+    """Decode once and run ``LeafImagePipeline.preprocess`` (image worker entry point)."""
+    return LeafImagePipeline(image_bytes).preprocess(vision_targets, roi_padding)
+
+
+def encode_vision_image_bytes(
+    image_bytes: bytes,
+    vision_targets: Sequence[VisionTarget],
+) -> dict[VisionTarget, tuple[bytes, int, int]]:
+    """Vision model inputs from an unprocessed image (used when preprocessing fails)."""
+    target_edge = max((max_edge for max_edge, _ in vision_targets), default=MAX_EDGE)
+    return LeafImagePipeline(image_bytes, target_edge=target_edge).encode_vision_images(vision_targets)
@@ -0,0 +1,122 @@
+"""Process pool for CPU-bound image work (pHash and OpenCV preprocessing).
+
+The pool is created in the FastAPI lifespan and attached to the app so request
+handlers can offload decoding, hashing and OpenCV filtering without stalling
+the event loop. Workers pin OpenCV's internal thread count so that N worker
+processes do not each spin up a full set of OpenCV threads.
+
+A worker that dies (e.g. killed for memory) breaks the whole executor. The
+next task to hit the broken pool replaces it once and is retried; tasks that
+still cannot run raise ``ImageWorkersUnavailable``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from fastapi import FastAPI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ResultType = TypeVar("ResultType")
+
+_restart_lock = asyncio.Lock()
+
+
+class ImageWorkersUnavailable(RuntimeError):
+    """The image process pool is broken and could not be restarted."""
+
+
+def _init_image_worker(opencv_threads: int) -> None:
+    """Limit native thread pools inside each worker process."""
+    # Must be set before numpy/OpenCV spin up their thread pools.
+    os.environ["OMP_NUM_THREADS"] = str(opencv_threads)
+    os.environ["OPENBLAS_NUM_THREADS"] = str(opencv_threads)
+
+    import cv2
+
+    cv2.setNumThreads(opencv_threads)
+
+
+def _resolve_worker_count() -> int:
+    if settings.IMAGE_WORKER_PROCESSES > 0:
+        return settings.IMAGE_WORKER_PROCESSES
+    return max(1, os.cpu_count() or 1)
+
+
+def _create_executor(workers: int) -> ProcessPoolExecutor:
+    # Spawn avoids forking a process that already holds Mongo/HTTP client threads.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_image_worker,
+        initargs=(settings.IMAGE_WORKER_OPENCV_THREADS,),
+    )
+
+
+def start(app: FastAPI) -> None:
+    """Create the image process pool and attach it to the app."""
+    workers = _resolve_worker_count()
+    app.image_executor = _create_executor(workers)
+    logger.info(
+        "Image worker pool started with %s processes (OpenCV threads per worker: %s)",
+        workers,
+        settings.IMAGE_WORKER_OPENCV_THREADS,
+    )
+
+
+def shutdown(app: FastAPI) -> None:
+    """Stop the image process pool, cancelling queued work."""
+    executor = getattr(app, "image_executor", None)
+    if executor is None:
+        return
+    executor.shutdown(wait=False, cancel_futures=True)
+    app.image_executor = None
+    logger.info("Image worker pool stopped")
+
+
+async def _restart(app: FastAPI, broken: ProcessPoolExecutor) -> None:
+    """Replace ``broken`` with a fresh pool, unless another task already did."""
+    async with _restart_lock:
+        if getattr(app, "image_executor", None) is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        app.image_executor = _create_executor(_resolve_worker_count())
+        logger.warning("Image worker pool was broken by a dead worker; restarted it")
+
+
+async def run_image_task(
+    app: FastAPI,
+    func: Callable[..., ResultType],
+    *args: Any,
+    **kwargs: Any,
+) -> ResultType:
+    """Run a picklable image function in the process pool and await its result.
+
+    Exceptions raised by ``func`` propagate unchanged; a pool that cannot run
+    the task raises ``ImageWorkersUnavailable``.
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(func, *args, **kwargs)
+    executor = getattr(app, "image_executor", None)
+    if executor is None:
+        # Fall back to the default thread pool when the lifespan has not started one.
+        return await loop.run_in_executor(None, call)
+    try:
+        return await loop.run_in_executor(executor, call)
+    except BrokenProcessPool:
+        await _restart(app, executor)
+
+    try:
+        return await loop.run_in_executor(app.image_executor, call)
+    except BrokenProcessPool as e:
+        raise ImageWorkersUnavailable("Image worker pool is unavailable") from e
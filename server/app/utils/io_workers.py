@@ -0,0 +1,40 @@
+"""Bounded thread pool for blocking I/O (weather lookups, sync LangChain fallbacks).
+
+The pool is created in the FastAPI lifespan and installed as the event loop's
+default executor, so ``asyncio.to_thread`` and LangChain's sync-in-executor
+fallbacks share one long-lived, size-capped set of threads instead of growing
+the interpreter's default pool under load.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def start(app: FastAPI) -> None:
+    """Create the I/O thread pool and make it the running loop's default executor."""
+    executor = ThreadPoolExecutor(
+        max_workers=settings.IO_THREAD_WORKERS,
+        thread_name_prefix="io-worker",
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+    app.io_executor = executor
+    logger.info("I/O thread pool started with %s threads", settings.IO_THREAD_WORKERS)
+
+
+def shutdown(app: FastAPI) -> None:
+    """Stop the I/O thread pool without waiting for in-flight lookups."""
+    executor = getattr(app, "io_executor", None)
+    if executor is None:
+        return
+    executor.shutdown(wait=False, cancel_futures=True)
+    app.io_executor = None
+    logger.info("I/O thread pool stopped")
@@ -0,0 +1,343 @@
+"""Resident near-duplicate index over 64-bit pHashes for image analysis reuse.
+
+Uses multi-index hashing: each hash is split into ``PHASH_BAND_COUNT`` bands and
+every band gets its own exact-match table. A radius query only probes band
+values within ``radius // PHASH_BAND_COUNT`` bit flips, then confirms candidates
+with a popcount, so lookups stay sub-millisecond regardless of index size.
+Entries are partitioned by ``(language, location_scope)`` like the cache key.
+
+Every uvicorn worker holds its own copy, so entries live in flat numpy arrays
+rather than Python objects. Each entry takes a slot: its hash, partition code,
+history id (24 bytes), and one ``band | band value | slot`` key per band in a
+single sorted table, under 100 bytes including spare capacity. New slots are
+appended and merged into the table in batches; until then queries scan them
+directly. Removed entries are tombstoned and dropped when the arrays are
+compacted.
+
+The index holds at most ``PHASH_INDEX_MAX_ENTRIES`` entries per worker. Beyond
+that the oldest entries are evicted; they stay in Mongo, and once anything has
+been evicted lookups that miss here fall back to the Mongo band query.
+
+The same fallback applies while the ``analysis_cache`` backfill migration has
+not been applied yet: it may be running in another worker, writing only to
+Mongo. Each worker polls for it and reloads the index once it is done.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+import numpy as np
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.db import migrations
+from app.db.analysis_cache import ANALYSIS_CACHE_COLLECTION
+from app.utils.image_hashing import (
+    PHASH_BAND_BITS,
+    PHASH_BAND_COUNT,
+    PHASH_BITS,
+    PHashMatch,
+    band_neighbours,
+    band_probe_radius,
+    phash_bands,
+    phash_hex_to_int,
+)
+
+logger = logging.getLogger(__name__)
+
+PartitionKey = tuple[str, str]
+
+# History ids are ObjectId hex strings.
+ENTRY_ID_BYTES = 24
+INITIAL_CAPACITY = 1024
+# Appended slots are merged into the band table once this many (or 1/32 of the
+# merged entries, whichever is larger) are waiting.
+MIN_MERGE_BATCH = 256
+# Tombstones are compacted away once there are this many and as many as live entries.
+MIN_COMPACT_TOMBSTONES = 1024
+# How often a worker checks whether the analysis_cache backfill has been applied.
+BACKFILL_POLL_SECONDS = 30.0
+
+# Band table key: band index | band value | slot.
+_SLOT_BITS = 32
+_BAND_SHIFT = _SLOT_BITS + PHASH_BAND_BITS
+_SLOT_MASK = np.uint64((1 << _SLOT_BITS) - 1)
+_BAND_MASK = np.uint64((1 << PHASH_BAND_BITS) - 1)
+_POPCOUNT_16 = np.array([bin(value).count("1") for value in range(1 << 16)], dtype=np.uint8)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Set bits of each uint64 value."""
+    return _POPCOUNT_16[values.view(np.uint16)].reshape(-1, 4).sum(axis=1)
+
+
+def _band_keys(hashes: np.ndarray, slots: np.ndarray) -> np.ndarray:
+    """Table keys of ``hashes`` stored at ``slots``, for every band."""
+    keys = []
+    for band in range(PHASH_BAND_COUNT):
+        shift = np.uint64(PHASH_BITS - PHASH_BAND_BITS * (band + 1))
+        values = (hashes >> shift) & _BAND_MASK
+        keys.append(
+            (np.uint64(band) << np.uint64(_BAND_SHIFT)) | (values << np.uint64(_SLOT_BITS)) | slots
+        )
+    return np.concatenate(keys)
+
+
+def _probe_prefixes(value: int, probe_radius: int) -> np.ndarray:
+    """Key prefixes (band index | band value) to probe for ``value``."""
+    prefixes = [
+        (band << PHASH_BAND_BITS) | probe
+        for band, band_value in enumerate(phash_bands(value))
+        for probe in band_neighbours(band_value, probe_radius)
+    ]
+    return np.array(prefixes, dtype=np.uint64) << np.uint64(_SLOT_BITS)
+
+
+class PHashIndex:
+    """In-process multi-index hashing table partitioned by language and location scope."""
+
+    def __init__(self, max_entries: int = 0) -> None:
+        self.max_entries = max_entries
+        self.evicted = 0
+        # False while analysis_cache may hold entries this index has not loaded.
+        self.complete = True
+        self._partition_codes: dict[PartitionKey, int] = {}
+        self._hashes = np.zeros(INITIAL_CAPACITY, dtype=np.uint64)
+        self._partitions = np.zeros(INITIAL_CAPACITY, dtype=np.uint32)
+        self._ids = np.zeros(INITIAL_CAPACITY, dtype=f"S{ENTRY_ID_BYTES}")
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        # Sorted keys of the slots below _merged, one per band.
+        self._table = np.zeros(0, dtype=np.uint64)
+        # Slots [_merged, _size) are not in the table yet; they are found by key here.
+        self._pending: dict[tuple[int, int], int] = {}
+        self._size = 0
+        self._merged = 0
+        self._live = 0
+        # No live slot is older than this (eviction cursor).
+        self._oldest = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self._hashes, self._partitions, self._ids, self._alive, self._table)
+        return sum(array.nbytes for array in arrays)
+
+    def add(self, language: str, location_scope: str, phash_hex: str, entry_id: str) -> bool:
+        """Register an analysis for a pHash; newer entries replace older ones for the same hash."""
+        value = phash_hex_to_int(phash_hex)
+        encoded_id = entry_id.encode("ascii", "ignore")
+        if value is None or len(encoded_id) > ENTRY_ID_BYTES:
+            return False
+        key = (language, location_scope)
+        code = self._partition_codes.get(key)
+        if code is None:
+            code = self._partition_codes[key] = len(self._partition_codes)
+
+        existing = self._find(code, value)
+        if existing is not None:
+            self._ids[existing] = encoded_id
+            return True
+
+        if self._size == len(self._hashes):
+            self._grow()
+        slot = self._size
+        self._hashes[slot] = value
+        self._partitions[slot] = code
+        self._ids[slot] = encoded_id
+        self._alive[slot] = True
+        self._pending[(code, value)] = slot
+        self._size += 1
+        self._live += 1
+
+        if self.max_entries > 0:
+            while self._live > self.max_entries:
+                self._evict_oldest()
+        if len(self._pending) >= max(MIN_MERGE_BATCH, self._merged // 32):
+            self._merge_pending()
+        return True
+
+    def remove(self, language: str, location_scope: str, phash: int) -> None:
+        """Drop a stale entry, e.g. when its analysis document no longer exists."""
+        code = self._partition_codes.get((language, location_scope))
+        if code is None:
+            return
+        slot = self._find(code, phash)
+        if slot is not None:
+            self._kill(slot)
+
+    def query(
+        self,
+        language: str,
+        location_scope: str,
+        phash_hex: str,
+        max_distance: int,
+    ) -> Optional[PHashMatch]:
+        """Return the closest entry within ``max_distance`` bits, if any."""
+        value = phash_hex_to_int(phash_hex)
+        if value is None:
+            return None
+        code = self._partition_codes.get((language, location_scope))
+        if code is None:
+            return None
+
+        slots = self._candidates(value, band_probe_radius(max_distance), code)
+        if slots.size == 0:
+            return None
+        distances = _popcount(self._hashes[slots] ^ np.uint64(value))
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None
+        slot = int(slots[best])
+        return PHashMatch(
+            entry_id=self._ids[slot].decode("ascii"),
+            distance=int(distances[best]),
+            phash=int(self._hashes[slot]),
+        )
+
+    def finish_loading(self) -> None:
+        """Merge everything appended so far, e.g. after the warm load."""
+        self._merge_pending()
+
+    def _find(self, code: int, value: int) -> Optional[int]:
+        slot = self._pending.get((code, value))
+        if slot is not None:
+            return slot
+        # An exact match shares the first band value.
+        prefix = np.uint64(phash_bands(value)[0]) << np.uint64(_SLOT_BITS)
+        start, end = np.searchsorted(self._table, [prefix, prefix + (_SLOT_MASK + np.uint64(1))])
+        slots = (self._table[start:end] & _SLOT_MASK).astype(np.int64)
+        matches = slots[
+            (self._hashes[slots] == np.uint64(value))
+            & (self._partitions[slots] == code)
+            & self._alive[slots]
+        ]
+        return int(matches[0]) if matches.size else None
+
+    def _candidates(self, value: int, probe_radius: int, code: int) -> np.ndarray:
+        """Live slots of partition ``code`` sharing a band with ``value`` within ``probe_radius`` flips."""
+        prefixes = _probe_prefixes(value, probe_radius)
+        starts = np.searchsorted(self._table, prefixes)
+        ends = np.searchsorted(self._table, prefixes + (_SLOT_MASK + np.uint64(1)))
+        lengths = ends - starts
+        total = int(lengths.sum())
+        # Concatenate the [start, end) ranges without a Python loop.
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        slots = np.unique((self._table[positions] & _SLOT_MASK).astype(np.int64))
+        # Slots not merged yet are few; check them all.
+        slots = np.concatenate([slots, np.arange(self._merged, self._size)])
+        return slots[self._alive[slots] & (self._partitions[slots] == code)]
+
+    def _grow(self) -> None:
+        capacity = len(self._hashes) * 2
+        for name in ("_hashes", "_partitions", "_ids", "_alive"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[: self._size] = array[: self._size]
+            setattr(self, name, grown)
+
+    def _merge_pending(self) -> None:
+        if self._merged == self._size:
+            return
+        slots = np.arange(self._merged, self._size, dtype=np.uint64)
+        keys = np.sort(_band_keys(self._hashes[self._merged : self._size], slots))
+        self._table = np.insert(self._table, np.searchsorted(self._table, keys), keys)
+        self._merged = self._size
+        self._pending.clear()
+
+    def _evict_oldest(self) -> None:
+        while not self._alive[self._oldest]:
+            self._oldest += 1
+        self._kill(self._oldest)
+        self.evicted += 1
+
+    def _kill(self, slot: int) -> None:
+        self._alive[slot] = False
+        self._live -= 1
+        if slot >= self._merged:
+            del self._pending[(int(self._partitions[slot]), int(self._hashes[slot]))]
+        dead = self._size - self._live
+        if dead >= MIN_COMPACT_TOMBSTONES and dead >= self._live:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop tombstoned slots, keeping insertion order, and rebuild the band table."""
+        live = np.flatnonzero(self._alive[: self._size])
+        count = live.size
+        for name in ("_hashes", "_partitions", "_ids", "_alive"):
+            array = getattr(self, name)
+            array[:count] = array[live]
+            array[count : self._size] = 0
+        self._size = self._merged = count
+        self._oldest = 0
+        self._pending.clear()
+        self._table = np.sort(_band_keys(self._hashes[:count], np.arange(count, dtype=np.uint64)))
+
+
+async def _load(app: FastAPI, index: PHashIndex) -> None:
+    # Most recently used last, so the entries evicted on overflow are the stalest.
+    cursor = app.mongodb[ANALYSIS_CACHE_COLLECTION].find(
+        {},
+        {"_id": 0, "phash": 1, "language": 1, "location_scope": 1, "history_id": 1},
+    ).sort("last_used_at", 1)
+    async for doc in cursor:
+        index.add(
+            language=doc.get("language") or "en",
+            location_scope=doc.get("location_scope") or "fallback",
+            phash_hex=doc.get("phash"),
+            entry_id=str(doc["history_id"]),
+        )
+    index.finish_loading()
+
+    logger.info(
+        "pHash index warm-loaded with %s entries (%.1f MB, %s evicted)",
+        len(index),
+        index.nbytes / 1e6,
+        index.evicted,
+    )
+
+
+async def _reload_after_backfill(app: FastAPI, index: PHashIndex) -> None:
+    while True:
+        await asyncio.sleep(BACKFILL_POLL_SECONDS)
+        try:
+            if not await migrations.is_applied(app.mongodb, migrations.BACKFILL_ANALYSIS_CACHE):
+                continue
+            await _load(app, index)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Reloading the pHash index after the backfill failed")
+            continue
+        index.complete = True
+        return
+
+
+async def start(app: FastAPI) -> None:
+    """Build the index from the analysis_cache collection and attach it to the app."""
+    index = PHashIndex(max_entries=settings.PHASH_INDEX_MAX_ENTRIES)
+    app.phash_index = index
+    if settings.PHASH_CACHE_LOOKUP != "memory":
+        logger.info("pHash index disabled; using Mongo band lookups")
+        return
+
+    index.complete = await migrations.is_applied(app.mongodb, migrations.BACKFILL_ANALYSIS_CACHE)
+    await _load(app, index)
+    if not index.complete:
+        logger.info("analysis_cache backfill pending; pHash lookups fall back to Mongo until it is applied")
+        app.phash_index_task = asyncio.create_task(_reload_after_backfill(app, index))
+
+
+async def shutdown(app: FastAPI) -> None:
+    task: Optional[asyncio.Task] = getattr(app, "phash_index_task", None)
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,180 @@
+"""Exact-match response cache for text analyses (symptoms and care tips).
+
+Keys are built from canonicalized user input (case, whitespace, punctuation and
+plant synonyms folded together), the response language and a coarse weather-risk
+bucket, so repeated questions from the same climate reuse one LLM answer.
+Each analysis type has its own LRU cache with a TTL and hit/miss counters.
+"""
+
+from __future__ import annotations
+
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+
+# Common names farmers use for the same crop, folded to one canonical name.
+PLANT_SYNONYMS = {
+    "tomatoes": "tomato",
+    "tamatar": "tomato",
+    "टमाटर": "tomato",
+    "paddy": "rice",
+    "dhan": "rice",
+    "धान": "rice",
+    "चावल": "rice",
+    "potatoes": "potato",
+    "aloo": "potato",
+    "आलू": "potato",
+    "brinjal": "eggplant",
+    "aubergine": "eggplant",
+    "baingan": "eggplant",
+    "बैंगन": "eggplant",
+    "chilli": "chili",
+    "chillies": "chili",
+    "chilies": "chili",
+    "mirchi": "chili",
+    "मिर्च": "chili",
+    "lady finger": "okra",
+    "ladyfinger": "okra",
+    "bhindi": "okra",
+    "भिंडी": "okra",
+    "lemons": "lemon",
+    "nimbu": "lemon",
+    "oranges": "orange",
+    "tea plant": "tea",
+    "bananas": "banana",
+    "kela": "banana",
+    "केला": "banana",
+    "corn": "maize",
+    "makka": "maize",
+    "मक्का": "maize",
+    "mustard greens": "mustard",
+    "sarson": "mustard",
+    "सरसों": "mustard",
+}
+
+
+def canonicalize_text(text: Optional[str]) -> str:
+    """Lower-case, drop punctuation/symbols and collapse whitespace.
+
+    Works on Unicode categories rather than ``\\w`` so Devanagari and Assamese
+    vowel signs are kept.
+    """
+    if not text:
+        return ""
+    normalized = unicodedata.normalize("NFKC", text).casefold()
+    cleaned = "".join(
+        " " if unicodedata.category(char)[0] in {"P", "S"} else char
+        for char in normalized
+    )
+    return " ".join(cleaned.split())
+
+
+def word_overlap(first: Optional[str], second: Optional[str]) -> float:
+    """Share of the shorter text's canonical words that also appear in the other."""
+    first_words = set(canonicalize_text(first).split())
+    second_words = set(canonicalize_text(second).split())
+    if not first_words or not second_words:
+        return 1.0 if first_words == second_words else 0.0
+    return len(first_words & second_words) / min(len(first_words), len(second_words))
+
+
+def canonical_plant_name(plant_type: Optional[str]) -> str:
+    name = canonicalize_text(plant_type)
+    return PLANT_SYNONYMS.get(name, name)
+
+
+class ResponseCache:
+    """LRU cache with a fixed TTL and hit/miss counters."""
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_symptoms_cache() -> ResponseCache:
+    return ResponseCache(
+        "symptoms",
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESPONSE_CACHE_SYMPTOMS_TTL_SECONDS,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_care_cache() -> ResponseCache:
+    return ResponseCache(
+        "care",
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESPONSE_CACHE_CARE_TTL_SECONDS,
+    )
+
+
+def symptoms_cache_key(
+    symptoms_description: str,
+    plant_type: Optional[str],
+    language: str,
+    weather_bucket: str,
+) -> tuple[str, ...]:
+    return (
+        canonicalize_text(symptoms_description),
+        canonical_plant_name(plant_type),
+        language,
+        weather_bucket,
+    )
+
+
+def care_cache_key(plant_type: str, language: str, weather_bucket: str) -> tuple[str, ...]:
+    return (canonical_plant_name(plant_type), language, weather_bucket)
@@ -0,0 +1,189 @@
+"""Semantic nearest-neighbour cache for free-text symptom analyses.
+
+Symptom descriptions are embedded together with the canonical plant name and
+compared by cosine similarity against earlier requests in the same
+``(language, weather_bucket)`` scope. A match above
+``SEMANTIC_CACHE_SIMILARITY_THRESHOLD`` returns the stored response without
+calling the ensemble.
+
+Each scope keeps a fixed-capacity, L2-normalised ``float32`` matrix so a lookup
+is a single matrix-vector product. Expired rows are reused first, then the
+least recently used row is evicted.
+
+A sampled fraction of hits is re-analysed in the background and compared with
+the cached answer; disagreements are counted as false hits so the threshold
+can be tuned from ``stats()``.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.response_cache import canonical_plant_name, canonicalize_text, word_overlap
+
+ScopeKey = tuple[str, str]
+
+
+@dataclass(slots=True)
+class SemanticMatch:
+    value: Any
+    similarity: float
+
+
+@dataclass(slots=True)
+class _Scope:
+    vectors: Optional[np.ndarray] = None
+    values: list[Any] = field(default_factory=list)
+    expires_at: Optional[np.ndarray] = None
+    last_used_at: Optional[np.ndarray] = None
+    size: int = 0
+
+    def allocate(self, capacity: int, dimension: int) -> None:
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.values = [None] * capacity
+        self.expires_at = np.zeros(capacity, dtype=np.float64)
+        self.last_used_at = np.zeros(capacity, dtype=np.float64)
+
+
+def build_semantic_text(symptoms_description: str, plant_type: Optional[str]) -> str:
+    """Text that gets embedded: canonical plant name plus normalised symptoms."""
+    plant = canonical_plant_name(plant_type)
+    symptoms = canonicalize_text(symptoms_description)
+    return f"{plant}: {symptoms}" if plant else symptoms
+
+
+def _normalise(vector: Sequence[float]) -> Optional[np.ndarray]:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    if array.ndim != 1 or norm == 0.0:
+        return None
+    return array / norm
+
+
+def same_diagnosis(cached: dict[str, Any], fresh: dict[str, Any]) -> bool:
+    """Loose agreement check used to score shadow verifications.
+
+    Severity must match and the likely conditions must share at least half of
+    their words, since two runs rarely phrase the same diagnosis identically.
+    """
+    if cached.get("severity") != fresh.get("severity"):
+        return False
+    return word_overlap(cached.get("likely_condition"), fresh.get("likely_condition")) >= 0.5
+
+
+class SemanticCache:
+    """Per-scope in-process vector store with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries_per_scope: int,
+        ttl_seconds: float,
+        similarity_threshold: float,
+    ) -> None:
+        self.name = name
+        self.max_entries_per_scope = max_entries_per_scope
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._scopes: dict[ScopeKey, _Scope] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shadow_checks = 0
+        self.shadow_mismatches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries_per_scope > 0 and self.ttl_seconds > 0
+
+    def lookup(self, scope: ScopeKey, vector: Sequence[float]) -> Optional[SemanticMatch]:
+        entry = self._scopes.get(scope)
+        query = _normalise(vector)
+        if entry is None or entry.size == 0 or query is None or query.shape[0] != entry.vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        size = entry.size
+        similarities = entry.vectors[:size] @ query
+        similarities[entry.expires_at[:size] <= now] = -1.0
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        entry.last_used_at[best] = now
+        self.hits += 1
+        return SemanticMatch(value=entry.values[best], similarity=round(similarity, 4))
+
+    def add(self, scope: ScopeKey, vector: Sequence[float], value: Any) -> None:
+        if not self.enabled:
+            return
+        normalised = _normalise(vector)
+        if normalised is None:
+            return
+
+        entry = self._scopes.get(scope)
+        if entry is None:
+            entry = self._scopes[scope] = _Scope()
+        if entry.vectors is None or entry.vectors.shape[1] != normalised.shape[0]:
+            # Embedding model changed (or first insert): start the scope afresh.
+            entry.allocate(self.max_entries_per_scope, normalised.shape[0])
+            entry.size = 0
+
+        now = time.monotonic()
+        if entry.size < self.max_entries_per_scope:
+            slot = entry.size
+            entry.size += 1
+        else:
+            expired = np.flatnonzero(entry.expires_at <= now)
+            if expired.size:
+                slot = int(expired[0])
+            else:
+                slot = int(np.argmin(entry.last_used_at))
+                self.evictions += 1
+
+        entry.vectors[slot] = normalised
+        entry.values[slot] = value
+        entry.expires_at[slot] = now + self.ttl_seconds
+        entry.last_used_at[slot] = now
+
+    def record_shadow_check(self, agreed: bool) -> None:
+        self.shadow_checks += 1
+        if not agreed:
+            self.shadow_mismatches += 1
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(entry.size for entry in self._scopes.values()),
+            "scopes": len(self._scopes),
+            "max_entries_per_scope": self.max_entries_per_scope,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "shadow_checks": self.shadow_checks,
+            "shadow_mismatches": self.shadow_mismatches,
+            "false_hit_rate": (
+                round(self.shadow_mismatches / self.shadow_checks, 4) if self.shadow_checks else None
+            ),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_semantic_symptoms_cache() -> SemanticCache:
+    return SemanticCache(
+        "symptoms",
+        max_entries_per_scope=settings.SEMANTIC_CACHE_MAX_ENTRIES if settings.SEMANTIC_CACHE_ENABLED else 0,
+        ttl_seconds=settings.RESPONSE_CACHE_SYMPTOMS_TTL_SECONDS,
+        similarity_threshold=settings.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+    )
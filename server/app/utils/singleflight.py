@@ -0,0 +1,75 @@
+"""Coalesce identical in-flight analyses into one pipeline run.
+
+The first caller for a key becomes the leader and starts the work as its own
+task; later callers with the same key await that task instead of starting
+another ensemble run. Waiters are shielded from each other, so a leader whose
+client disconnects does not cancel the work followers are waiting on, and the
+work still finishes and populates the caches. If the work fails, every waiter
+gets the exception and the key is released so the next request retries.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Per-key request coalescing with leader/follower counters."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Run ``func`` once per key; returns ``(result, coalesced)``."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._release(key, done))
+        return await asyncio.shield(task), False
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        error = task.exception()  # also marks the exception as retrieved
+        if error is not None:
+            self.failures += 1
+            logger.warning("Singleflight %s leader failed for %r: %s", self.name, key, error)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+        }
+
+
+_groups: dict[str, SingleFlight] = {}
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    group = _groups.get(name)
+    if group is None:
+        group = _groups[name] = SingleFlight(name)
+    return group
+
+
+def singleflight_stats() -> dict[str, dict[str, Any]]:
+    return {name: group.stats() for name, group in _groups.items()}
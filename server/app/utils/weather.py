@@ -63,7 +63,7 @@ def _to_float_list(source: Any) -> list[float]:
     return list(source) if source is not None else []
 
 
-def _describe_risk(
+def _risk_bucket(
     avg_humidity: float,
     total_precipitation: float,
     max_precipitation_probability: float,
@@ -75,17 +75,41 @@ def _describe_risk(
     cool = temperature_min <= 16
 
     if rainy_or_humid and warm:
+        return "humid-warm"
+    if rainy_or_humid:
+        return "humid"
+    if warm and not cool:
+        return "warm"
+    return "mixed"
+
+
+def _describe_risk(
+    avg_humidity: float,
+    total_precipitation: float,
+    max_precipitation_probability: float,
+    temperature_min: float,
+    temperature_max: float,
+) -> str:
+    bucket = _risk_bucket(
+        avg_humidity=avg_humidity,
+        total_precipitation=total_precipitation,
+        max_precipitation_probability=max_precipitation_probability,
+        temperature_min=temperature_min,
+        temperature_max=temperature_max,
+    )
+
+    if bucket == "humid-warm":
         return (
             "High fungal pressure expected. Prioritize fungal diseases such as powdery mildew, leaf spot, downy mildew, rust, and blights. "
             "Delay contact sprays before rain and favor systemic or rain-safe treatments when timing matters."
         )
 
-    if rainy_or_humid:
+    if bucket == "humid":
         return (
             "Moderate fungal pressure expected. Watch for leaf spots, mildew, and soft rots, especially on dense canopies and water-sensitive crops."
         )
 
-    if warm and not cool:
+    if bucket == "warm":
         return (
             "Warm conditions may increase stress-related issues and some insect pressure; keep an eye on drought stress, mites, and secondary infections."
         )
@@ -95,6 +119,19 @@ def _describe_risk(
     )
 
 
+def climate_risk_bucket(context: Optional[LocationClimateContext]) -> str:
+    """Coarse weather-risk class used in cache keys instead of raw coordinates."""
+    if context is None:
+        return "unknown"
+    return _risk_bucket(
+        avg_humidity=context.avg_humidity,
+        total_precipitation=context.total_precipitation,
+        max_precipitation_probability=context.max_precipitation_probability,
+        temperature_min=context.temperature_min,
+        temperature_max=context.temperature_max,
+    )
+
+
 def _fetch_forecast(latitude: float, longitude: float) -> dict[str, Any]:
     client = _get_openmeteo_client()
     params = {